@@ -3,66 +3,18 @@ from tkinter import ttk, font, filedialog, messagebox
 
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import wordcloud as wc
 
 import pandas as pd
 import numpy as np
-from PIL import Image
+from PIL import ImageTk
 
-from copy import deepcopy, copy
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 import os
-from ast import literal_eval
 import re
 
-def compress_dataframe(dataframe):
-    "Compress dataframe inplace, mainly for floats, ints and categorical variables"
-
-    def int_compress(col, float_val=False):
-        if not float_val:
-            for i in col:
-                data = dataframe[i].values
-                max_val = data.max()
-                min_val = data.min()
-
-                if (max_val<=127 and min_val>=-128):
-                    dataframe[i] = data.astype("int8")
-                elif (min_val>=-32768 and max_val<=32767):
-                    dataframe[i] = data.astype("int16")
-                elif (min_val>=-2,147,483,648 and max_val<=2,147,483,647):
-                    dataframe[i] = data.astype("int32")
-        else:
-            for i in col:
-                data = dataframe[i]
-                val = data.fillna(-1).values
-                max_val = val.max()
-                min_val = val.min()
-
-                if (max_val<=127 and min_val>=-128):
-                    dataframe[i] = data.astype("Int8")
-                elif (min_val>=-32768 and max_val<=32767):
-                    dataframe[i] = data.astype("Int16")
-                elif (min_val>=-2,147,483,648 and max_val<=2,147,483,647):
-                    dataframe[i] = data.astype("Int32")
-
-    def float_compress(col):
-        pass
-
-    def obj_compress(col):
-        for i in col:
-            unique = len(dataframe[i].unique())
-            if unique <= 20:
-                dataframe[i] = dataframe[i].astype("category")
-
-    int64_col = dataframe.select_dtypes("int64").columns
-    int_compress(int64_col)
-
-    float64_col = dataframe.select_dtypes("float64").columns   
-    float_to_int = [i for i in float64_col if all(np.isclose(data:=dataframe[i].fillna(-1).values, data.astype('int')))]
-    # float_to_int = [i for i in float64_col if all(np.isclose(dataframe[i].fillna(-1).values, dataframe[i].fillna(-1).values.astype('int')))]
-    int_compress(float_to_int, float_val=True)
-    
-    obj_col = dataframe.select_dtypes("object")
-    obj_compress(obj_col)
+from plotting import PlotError, IcicleLayout, RectangleIndex, render, save, icicle_image
+from dataset import DataView
 
 # Classes that are basically done
 
@@ -200,6 +152,149 @@ class Scrollable(tk.Frame):
         self.canvas.destroy()
         return super().destroy()
 
+class ProgressDialog(tk.Toplevel):
+    """
+    Small window with a progressbar and a cancel button, used while long running tasks (e.g. reading data) are busy.
+    The cancelled attribute is set to True when the user presses cancel or closes the window.
+    """
+
+    def __init__(self, master, title, text, **kw):
+        super().__init__(master=master, **kw)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(master)
+        self.cancelled = False
+
+        self.text = tk.StringVar(value=text)
+        label = ttk.Label(self, textvariable=self.text, anchor='w')
+        self.progress = ttk.Progressbar(self, orient=tk.HORIZONTAL, length=300, mode='determinate', maximum=1.0)
+        cancel = ttk.Button(self, text='Cancel', command=self.cancel)
+
+        label.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 5))
+        self.progress.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+        cancel.pack(side=tk.BOTTOM, padx=10, pady=(5, 10))
+
+        self.protocol('WM_DELETE_WINDOW', self.cancel)
+        self.grab_set()
+
+    def set(self, fraction, text=None):
+        "Update the progressbar (fraction between 0 and 1) and optionally the text"
+        self.progress['value'] = fraction
+        if text is not None:
+            self.text.set(text)
+
+    def cancel(self):
+        self.cancelled = True
+
+class JobScheduler:
+    """
+    Runs heavy work (reading and filtering data, building figures) on a pool of worker threads so the Tk mainloop never
+    blocks. Results are marshalled back to the Tk thread by polling the running jobs with after().
+
+    Every job has a key. Submitting a job for a key which still has a job in flight replaces the old job, its result is
+    thrown away. This gives at most one job in flight per key (e.g. per notebook tab).
+
+    Arguments:
+    master: widget used for the after() polling
+    workers: maximum number of worker threads
+    interval: polling interval in milliseconds
+    on_busy: called with the number of running jobs whenever that number changes
+    """
+
+    def __init__(self, master, workers=None, interval=50, on_busy=None):
+        self.master = master
+        self.interval = interval
+        self.on_busy = on_busy
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self._polling = False
+
+    def submit(self, key, func, *args, callback=None, errback=None, progress=None, **kwargs):
+        """Runs func(*args, **kwargs) on a worker thread. When it is done callback(result) or errback(error) is called on
+        the Tk thread. progress() is called on the Tk thread on every poll while the job is running."""
+        self.cancel(key)
+        future = self.executor.submit(func, *args, **kwargs)
+        self.jobs[key] = (future, callback, errback, progress)
+        self._busy_changed()
+
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.interval, self.poll)
+        return future
+
+    def cancel(self, key):
+        "Forget the job with the given key. A job that has already started runs to its end, but its result is ignored"
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            job[0].cancel()
+            self._busy_changed()
+
+    def poll(self):
+        try:
+            for key, (future, callback, errback, progress) in list(self.jobs.items()):
+                if self.jobs.get(key, (None,))[0] is not future:
+                    continue   # cancelled or replaced by an earlier callback of this poll
+
+                try:
+                    if not future.done():
+                        if progress is not None:
+                            progress()
+                        continue
+
+                    del self.jobs[key]
+                    self._busy_changed()
+
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        if errback is not None:
+                            errback(error)
+                        else:
+                            messagebox.showerror(title='Error', message=str(error))
+                    else:
+                        if callback is not None:
+                            callback(result)
+
+                except Exception as error:
+                    # A failing callback (e.g. on a destroyed widget) must not stop the results of the other jobs
+                    messagebox.showerror(title='Error', message=f'{type(error).__name__}: {error}')
+        finally:
+            if self.jobs:
+                self.master.after(self.interval, self.poll)
+            else:
+                self._polling = False
+
+    def shutdown(self):
+        for key in list(self.jobs):
+            self.cancel(key)
+        self.executor.shutdown(wait=False)
+
+    def _busy_changed(self):
+        if self.on_busy is not None:
+            self.on_busy(len(self.jobs))
+
+class StatusBar(ttk.Frame):
+    "Frame showing whether the application is busy with background jobs"
+
+    def __init__(self, master, **kw):
+        super().__init__(master=master, **kw)
+        self.text = tk.StringVar(value='Ready')
+        label = ttk.Label(self, textvariable=self.text, anchor='w')
+        self.progress = ttk.Progressbar(self, orient=tk.HORIZONTAL, length=150, mode='indeterminate')
+
+        label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.progress.pack(side=tk.RIGHT, padx=5, pady=2)
+
+    def set_busy(self, jobs):
+        if jobs:
+            self.text.set(f'Working on {jobs} task(s)...')
+            self.progress.start(10)
+            self.winfo_toplevel().config(cursor='watch')
+        else:
+            self.text.set('Ready')
+            self.progress.stop()
+            self.winfo_toplevel().config(cursor='')
+
 class CustomToolbar(NavigationToolbar2Tk):
 
     """
@@ -255,138 +350,475 @@ class CustomToolbar(NavigationToolbar2Tk):
 
 
 class DataTable(ttk.Frame):
-    "Creates table representation of dataframe"
+    """
+    Creates table representation of dataframe (or DataView)
+
+    The table is virtual: the data stays in pandas and the Treeview only holds as many items as fit on the screen.
+    Scrolling moves a window over the rows and refills those items. Rows are only formatted to strings when they come
+    into view, together with a buffer of rows around them, so the whole dataset can be browsed with constant memory.
+
+    Clicking a column heading sorts the rows on that column (again to reverse), which only computes a permutation of
+    the rows. The summary rows pinned at the top show statistics per column, which are computed once and kept until
+    the data changes. Sorting and the statistics are computed with the scheduler in options, if there is one.
+
+    options: None or a dictionary with the optional key 'scheduler' (a JobScheduler)
+    """
+
+    buffer = 100   # number of rows formatted in advance on either side of the rows in view
+    sample_size = 1000   # number of rows used to estimate the column widths
+    width_quantile = 0.95   # the column width fits this fraction of the sampled values
+
     def __init__(self, master, dataframe, options, **kw):
         super().__init__(master=master, **kw)
-        dataframe = dataframe.astype(str)
-        columns = dataframe.columns
+        options = options or {}
+        self.scheduler = options.get('scheduler')
+        self.widths = {}   # cached column widths in pixels, kept when the table is updated
+        self.sorted_by = None   # (column, ascending)
+        self.summary = None   # formatted summary rows, None when not computed for the current data
+        self.set_data(dataframe)
+        columns = self.base.columns
         self.table = ttk.Treeview(self, columns=tuple(columns))
+        self.table.tag_configure('summary', background='#e8e8e8')
+
+        self.show_summary = tk.IntVar(value=0)
+        summary_check = ttk.Checkbutton(self, text='Column summary', variable=self.show_summary,
+                                        command=self.toggle_summary)
 
-        scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.table.yview)
-        self.table.config(yscrollcommand=scroll.set)
+        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
 
-        self.create_entries(dataframe)
+        self.table.bind('<Configure>', lambda event: self.render())
+        self.table.bind('<MouseWheel>', lambda event: self.yview('scroll', -1 if event.delta > 0 else 1, 'units'))
+        self.table.bind('<Button-4>', lambda event: self.yview('scroll', -1, 'units'))
+        self.table.bind('<Button-5>', lambda event: self.yview('scroll', 1, 'units'))
 
-        scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.table.pack(side=tk.BOTTOM, fill='both')
+        self.create_entries()
 
-    def create_entries(self, dataframe, init=False):
+        summary_check.pack(side=tk.TOP, anchor=tk.E, padx=5)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.pack(side=tk.BOTTOM, fill='both', expand=True)
+
+    def set_data(self, dataframe):
+        "Stores the data as the base dataframe plus the positions of the rows to show (None for all rows)"
+        if isinstance(dataframe, DataView):
+            self.base = dataframe.base
+            self.positions = None if dataframe.mask is None else dataframe.positions
+        else:
+            self.base = dataframe
+            self.positions = None
+
+        self.order = None   # permutation of the rows when sorted
+        self.offset = 0
+        self.formatted = (0, [], [])   # first row, formatted rows and index texts of the buffer
+
+    def row_count(self):
+        return len(self.base.index) if self.positions is None else len(self.positions)
+
+    def create_entries(self, init=False):
         
-        columns = dataframe.columns
+        columns = self.base.columns
         font_obj = font.Font()
 
         self.table.heading('#0', text='Index')
 
-        for index, row in dataframe.iterrows():
-            row = tuple(row)
-            self.table.insert('', 'end', values=row, text=index)
+        self.render()
 
         if not init:
             width = font_obj.measure('Index')
             self.table.column('#0', width=width, stretch=True)
             for i in columns:
-                self.table.heading(i, text=i)
-                longest = max(dataframe[i].values, key=len).strip()
-                longest_val = font_obj.measure(text=longest)
-                index_val = font_obj.measure(text=i)
-                width = max(longest_val, index_val)
-                self.table.column(i, width=width, stretch=True)
+                self.table.heading(i, text=i, command=lambda column=i: self.sort(column))
+
+        missing = [i for i in columns if i not in self.widths]
+        if missing:
+            self.widths.update(self.measure_columns(missing, font_obj))
+            for i in missing:
+                self.table.column(i, width=self.widths[i], stretch=True)
+
+    def measure_columns(self, columns, font_obj):
+        """Estimates the widths of the columns from a sample of the rows. Per column the string lengths of the sample are
+        computed at once with str.len, and only the value at the width_quantile of those lengths is measured"""
+        total = self.row_count()
+        if total > self.sample_size:
+            sample = np.linspace(0, total - 1, self.sample_size).astype(int)
+        else:
+            sample = np.arange(total)
+        if self.positions is not None:
+            sample = self.positions[sample]
+        sample = self.base.iloc[sample][columns].astype(str)
+
+        widths = {}
+        for i in columns:
+            values = sample[i].str.strip()
+            if len(values.index):
+                lengths = values.str.len()
+                target = lengths.quantile(self.width_quantile)
+                value = values.iloc[int((lengths - target).abs().values.argmin())]
+            else:
+                value = ''
+            widths[i] = max(font_obj.measure(text=value), font_obj.measure(text=str(i)))
+        return widths
+
+    def rows_in_view(self):
+        "Number of rows that fit in the Treeview"
+        style = ttk.Style()
+        row_height = style.lookup('Treeview', 'rowheight')
+        row_height = int(row_height) if row_height else font.nametofont('TkDefaultFont').metrics('linespace') + 4
+        height = self.table.winfo_height()
+
+        if height <= 1:   # not drawn yet
+            return int(self.table.cget('height'))
+        return max(1, height // row_height - 1)   # minus the heading
+
+    def format_rows(self, start, end):
+        """Formats the rows start to end of the shown (sorted) data, the rows are only taken from base here. Returns the
+        formatted rows and the row numbers to show as index"""
+        numbers = np.arange(start, end) if self.order is None else self.order[start:end]
+        positions = numbers if self.positions is None else self.positions[numbers]
+        rows = self.base.iloc[positions]
+        return list(rows.astype(str).itertuples(index=False, name=None)), numbers.tolist()
+
+    def render(self):
+        "Fills the items of the Treeview with the summary rows and the rows from offset onwards"
+        pinned = self.summary if self.show_summary.get() and self.summary is not None else []
+        visible = max(1, self.rows_in_view() - len(pinned))
+        total = self.row_count()
+        self.offset = max(0, min(self.offset, total - visible))
+        end = min(self.offset + visible, total)
+
+        start, rows, numbers = self.formatted
+        if self.offset < start or end > start + len(rows):
+            start = max(0, self.offset - self.buffer)
+            rows, numbers = self.format_rows(start, min(end + self.buffer, total))
+            self.formatted = (start, rows, numbers)
+
+        entries = [(text, values, ('summary',)) for text, values in pinned]
+        entries += [(numbers[index - start], rows[index - start], ()) for index in range(self.offset, end)]
+
+        items = self.table.get_children()
+        if len(items) > len(entries):
+            self.table.delete(*items[len(entries):])
+            items = items[:len(entries)]
+
+        for number, (text, values, tags) in enumerate(entries):
+            if number < len(items):
+                self.table.item(items[number], values=values, text=text, tags=tags)
+            else:
+                self.table.insert('', 'end', values=values, text=text, tags=tags)
+
+        if total:
+            self.scroll.set(self.offset/total, end/total)
+        else:
+            self.scroll.set(0, 1)
+
+    def yview(self, *args):
+        "Scrollbar command, moves the window of rows shown"
+        visible = self.rows_in_view()
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * self.row_count())
+        elif args[0] == 'scroll':
+            step = visible if args[2] == 'pages' else 1
+            self.offset += int(args[1]) * step
+        self.render()
 
     def update(self, new_data):
-        self.table.delete(*self.table.get_children())
-        new_data = new_data.astype(str)
-        self.create_entries(new_data, init=True)
+        if self.scheduler is not None:
+            self.scheduler.cancel((self, 'sort'))
+            self.scheduler.cancel((self, 'summary'))
+
+        self.set_data(new_data)
+        self.summary = None
+        self.create_entries(init=True)
+
+        if self.sorted_by is not None:
+            self.sort(*self.sorted_by)
+        if self.show_summary.get():
+            self.toggle_summary()
+
+    def destroy(self):
+        "Forgets the sort and summary jobs, their callbacks would render into the destroyed Treeview"
+        if self.scheduler is not None:
+            self.scheduler.cancel((self, 'sort'))
+            self.scheduler.cancel((self, 'summary'))
+        super().destroy()
+
+    def run(self, name, func, *args, callback):
+        "Runs func with the scheduler when there is one, otherwise straight away"
+        if self.scheduler is None:
+            callback(func(*args))
+        else:
+            self.scheduler.submit((self, name), func, *args, callback=callback)
+
+    def sort(self, column, ascending=None):
+        "Sorts the rows on column. Without ascending given, sorting on the same column again reverses the order"
+        if ascending is None:
+            ascending = self.sorted_by != (column, True)
+        self.sorted_by = (column, ascending)
+
+        for i in self.base.columns:
+            arrow = (' \u25b2' if ascending else ' \u25bc') if i == column else ''
+            self.table.heading(i, text=f'{i}{arrow}')
+
+        def done(order):
+            self.order = order
+            self.formatted = (0, [], [])
+            self.render()
+
+        self.run('sort', self.sort_order, self.base, self.positions, column, ascending, callback=done)
+
+    @staticmethod
+    def sort_order(base, positions, column, ascending):
+        "Permutation of the rows (numbers of the rows shown, not of base) that sorts them on column. Missing values last"
+        values = base[column] if positions is None else base[column].iloc[positions]
+        values = values.reset_index(drop=True)
+        return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.values
+
+    def toggle_summary(self):
+        "Shows or hides the summary rows, the statistics are computed the first time they are shown for the data"
+        if self.show_summary.get() and self.summary is None:
+            def done(summary):
+                self.summary = summary
+                self.render()
+
+            self.run('summary', self.summarise, self.base, self.positions, callback=done)
+        else:
+            self.render()
+
+    @staticmethod
+    def summarise(base, positions):
+        """Statistics (count, nulls, distinct, min, max, top value) of every column of the rows shown. Per column a single
+        value_counts gives the distinct values, from which distinct, min, max and top are taken.
+        Returns a list of (name of the statistic, formatted values) rows"""
+        stats = {'count': [], 'nulls': [], 'distinct': [], 'min': [], 'max': [], 'top': []}
+
+        for column in base.columns:
+            values = base[column] if positions is None else base[column].iloc[positions]
+            counts = values.value_counts(sort=False)
+            counts = counts[counts.values > 0]
+            nulls = int(values.isna().sum())
 
+            stats['count'].append(len(values) - nulls)
+            stats['nulls'].append(nulls)
+            stats['distinct'].append(len(counts))
+            stats['top'].append(counts.idxmax() if len(counts) else '')
+
+            distinct = counts.index
+            if isinstance(distinct, pd.CategoricalIndex):
+                distinct = pd.Index(np.asarray(distinct))
+
+            try:
+                stats['min'].append(distinct.min() if len(distinct) else '')
+                stats['max'].append(distinct.max() if len(distinct) else '')
+            except TypeError:   # values that can not be compared, e.g. numbers and strings mixed
+                stats['min'].append('')
+                stats['max'].append('')
+
+        return [(name, tuple(str(value) for value in values)) for name, values in stats.items()]
+
+
+class PrefixIndex:
+    """
+    Index of the values of a filter box for autocompletion. The values are given in order of preference (most frequent
+    first). Their lowercased strings are sorted once, so the values starting with a prefix are found with two binary
+    searches. Of those, the most frequent ones are picked with a partial sort of their ranks.
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.lower = [str(value).lower() for value in self.values]
+        self.order = np.array(sorted(range(len(self.lower)), key=self.lower.__getitem__), dtype=np.int64)
+        self.keys = np.array([self.lower[i] for i in self.order], dtype=object)
+
+    def prefix(self, text, n=10):
+        "The n most frequent values starting with text (lowercase)"
+        start = np.searchsorted(self.keys, text, side='left')
+        end = np.searchsorted(self.keys, text + '\U0010ffff', side='left')
+        ranks = self.order[start:end]
+        if len(ranks) > n:
+            ranks = np.partition(ranks, n)[:n]
+        return [self.values[i] for i in np.sort(ranks)]
+
+    def search(self, text, n=10, limit=200000, exclude=()):
+        "Up to n values containing text (lowercase), looking at no more than the limit most frequent values"
+        found = []
+        for value, lower in zip(self.values[:limit], self.lower[:limit]):
+            if text in lower and value not in exclude:
+                found.append(value)
+                if len(found) == n:
+                    break
+        return found
 
 class CheckCombo(ttk.Combobox):
+    """
+    Combobox which suggests the values starting with the typed text. When fewer than 10 values start with it, values
+    containing the text are added by a slower search, which only runs after the user stops typing for delay ms.
+
+    The values are either given directly (values) or loaded when the box is first focused or opened (loader). The loader
+    is called with a callback, to which it passes a PrefixIndex of the values when they are ready, and an errback, which
+    it calls without arguments when they could not be loaded, so they are loaded again the next time.
+    """
+
+    delay = 250
 
     def __init__(self, master, **kw):
         self.stringvar = tk.StringVar()
-        self.options = kw.pop('values')
-        super().__init__(master=master, textvariable=self.stringvar, values=list(self.options[0:10]), **kw)
+        values = kw.pop('values', None)
+        self.loader = kw.pop('loader', None)
+        self.options = []
+        self.index = None
+        self._loading = False
+        self._search = None
+        super().__init__(master=master, textvariable=self.stringvar, values=[], **kw)
         self.bind('<KeyRelease>', self.get_val)
 
+        self.bind('<FocusIn>', self.load, add=True)
+        self['postcommand'] = self.load
+        if values is not None:
+            self.set_index(PrefixIndex(values))
+
+    def reset(self, values=None, loader=None):
+        "Replaces the values of the box, e.g. when another dataset is loaded"
+        self.loader = loader
+        self.index = None
+        self.options = []
+        self._loading = False
+        self['values'] = []
+        if values is not None:
+            self.set_index(PrefixIndex(values))
+
+    def load(self, event=None):
+        if self.index is None and not self._loading and self.loader is not None:
+            self._loading = True
+            self.loader(self.set_index, self.load_failed)
+
+    def load_failed(self):
+        self._loading = False
+
+    def set_index(self, index):
+        if not self.winfo_exists():   # the box was destroyed while the values were loading
+            return
+        self.index = index
+        self.options = index.values
+        self['values'] = list(self.options[0:10])
+        if self.stringvar.get().strip():
+            self.get_val(None)
+
     def get_val(self, event):
-        val = self.stringvar.get().strip()
-        if val:
-            options = [str(x) for x in self.options]
-            val = val.lower()
-            regex = re.compile(f'{val}')
-            values = [index for index, value in enumerate(options) if regex.match(value.lower())]
-            n = len(values)
+        if self._search is not None:
+            self.after_cancel(self._search)
+            self._search = None
 
-            if n >= 10:
-                values = values[0:10]
-            else:
-                regex = re.compile(f'[{val}]')
-                values = [index for index, value in enumerate(options) if regex.match(value.lower())]
-                new = len(values)
-                if new >= 10:
-                    values = values[0:10]
-                
-            self['values'] = [self.options[i] for i in values] if len(values)>0 else self.options[0:10]
+        if self.index is None:   # values are still loading
+            return
+
+        val = self.stringvar.get().strip().lower()
+        if val:
+            values = self.index.prefix(val)
+            if len(values) < 10:
+                self._search = self.after(self.delay, self.search, val, values)
+            self['values'] = values if len(values)>0 else list(self.options[0:10])
         else:
-            self['values'] = self.options[0:10]
+            self['values'] = list(self.options[0:10])
+
+    def search(self, val, values):
+        "Completes the prefix matches with values containing val"
+        self._search = None
+        values = values + self.index.search(val, n=10-len(values), exclude=set(values))
+        self['values'] = values if len(values)>0 else list(self.options[0:10])
  
 
 class NotebookTab(ttk.Frame):
-    "A ttk Frame with the frame layout and figure for the notebook"
+    """
+    A ttk Frame with the frame layout and figure for the notebook.
+
+    options and labels are dictionaries of plain values (see LabelFrameInput.get_values), so the figure can be built away
+    from the Tk thread. When a JobScheduler is given the figure is built on a worker thread and the tab shows a busy
+    message until it is done, otherwise it is built straight away. Wordclouds then first show a quick low resolution
+    preview, which the full resolution wordcloud replaces when it is ready. Saving is only possible once it is there.
+    """
 
-    def __init__(self, master, notebook, data, kind, options, labels, *args, **kwargs):
+    def __init__(self, master, notebook, data, kind, options, labels, *args, scheduler=None, **kwargs):
         super().__init__(master=master, **kwargs)
 
+        self.notebook = notebook
+        self.kind = kind
+        self.options = options
+        self.labels = labels
         self.hover = False
         self.is_empty = True
         self.is_wordcloud = False
 
-        plot_types = {
-            'Barplot': self.barplot,
-            'Wordcloud': self.wordcloud,
-            'Icicle': self.icicle,
-            'Line': self.line,
-            'Test': self.test
-        }
+        self.busy_label = ttk.Label(self, text='Rendering...', anchor=tk.CENTER)
+        self.busy_label.pack(side=tk.TOP, fill='both', expand=True)
 
-        if labels['xkcd'].get():
-            with plt.xkcd():
-                figure = plot_types[kind](data=data, options=options, labels=labels)
+        if scheduler is None:
+            try:
+                self.show(self.build(data, kind, options, labels))
+            except PlotError as error:
+                self.show_error(error)
         else:
-            figure = plot_types[kind](data=data, options=options, labels=labels)
-
-        # figure = plot_types[kind](data=data, options=options, labels=labels)
+            if kind == 'Wordcloud':
+                # Errors are reported by the full resolution job
+                scheduler.submit((self, 'preview'), self.build, data, kind, {**options, 'preview': 1}, labels,
+                                 callback=self.show_preview, errback=lambda error: None)
+            scheduler.submit(self, self.build, data, kind, options, labels,
+                             callback=self.show, errback=self.show_error)
+
+    def build(self, data, kind, options, labels):
+        "Creates the figure with plotting.render. Does not touch any Tk widgets, so it is safe to run on a worker thread"
+        source = None
+        if isinstance(data, DataView):
+            source = data.key()
+            data = data.frame()
+
+        if kind == 'Test':
+            return TestPlot(data, options)
+
+        return render(data, kind, options, labels, source)
+
+    def show_preview(self, figure):
+        "Shows a preview, unless the full figure is already there"
+        if self.is_empty and self.winfo_exists():
+            self.show(figure)
+
+    def show(self, figure):
+        "Places the built figure in the tab, replacing a preview, must be called on the Tk thread"
+        labels = self.labels
+        self.busy_label.destroy()
 
         if figure is None:
-            pass
+            self.close()
         
-        elif isinstance(figure, tk.Canvas):
+        elif isinstance(figure, IcicleLayout):
             self.is_empty = False
-            title = labels['title'].get().strip()
+            title = labels['title'].strip()
             title = title if title else None
 
-            if title is not None:
-                figure.canvas.create_text(0, 0, text=title)
-            
-            canvas = figure.canvas
+            buttons = ttk.Frame(self)
+            buttons.pack(side=tk.BOTTOM, fill=tk.X)
+            plot = IciclePlot(self, figure, title=title)
+            plot.pack(fill='both', expand=True)
+            ttk.Button(buttons, text='Save', command=plot.save).pack(side=tk.LEFT, padx=5, pady=5)
         
         else:
+            if not self.is_empty:
+                self.figure_frame.destroy()
             self.is_empty = False
-            title = labels['title'].get()
-            title = title if title != '' else None
+            self.wc = getattr(figure, 'wordcloud', None)
+            self.is_wordcloud = self.wc is not None
 
-            if title is not None:
-                figure.suptitle(title)
-                figure.set_tight_layout(True)
-            else:
-                figure.set_tight_layout(True)
+            if self.kind == 'Line':
+                self.hover = self.line_hover(figure, self.options)
 
-            self.canvas = FigureCanvasTkAgg(figure, master=self)
+            self.figure_frame = ttk.Frame(self)
+            self.figure_frame.pack(fill='both', expand=True)
+            self.canvas = FigureCanvasTkAgg(figure, master=self.figure_frame)
 
             if self.hover is not False:
                 self.canvas.mpl_connect('motion_notify_event', lambda event: self.hover(event))
 
             toolbar_kwargs = {
                 'canvas': self.canvas,
-                'window': self,
+                'window': self.figure_frame,
                 'figure': figure
             }
 
@@ -395,130 +827,42 @@ class NotebookTab(ttk.Frame):
 
             toolbar = CustomToolbar(**toolbar_kwargs)
             toolbar.update()
+            if getattr(self.wc, 'preview', False):
+                # only the full resolution wordcloud is saved, this toolbar is rebuilt when it is shown
+                toolbar._buttons['Save'].config(state=tk.DISABLED)
 
             self.canvas.draw()
             self.canvas.get_tk_widget().pack(side=tk.TOP, fill='both', expand=True)
 
-    def wordcloud(self, data, options, labels):
-        self.is_wordcloud = True
-        figure = plt.Figure(figsize=(7, 5))
-        ax = figure.add_subplot()
-        groupby_column = options['column'].get()
+    def show_error(self, error):
+        if isinstance(error, PlotError):
+            messagebox.showerror(title=error.title, message=error.message)
+        else:
+            messagebox.showerror(title='Plot', message=f'The graph could not be made.\n{error}')
+        self.close()
 
-        def transform_format(val):
-            if val == 0:
-                return 255
-            else:
-                return val
-        # Data manipulation
+    def close(self):
         try:
-            names = data[groupby_column].value_counts()
-            names = names.sort_index(ascending=True)
-            names = names[names.index.str.match(r"^[a-zA-Z ']+$", na=False)]
-            
-            filt = options['filter'].get().strip()
-            if filt:
-                names = names[~(names.index.str.match(filt))]
-            
-            names = names.to_dict()
-
-            bg = options['bg'].get()
-            bg = 'white' if bg == '' else bg.lower()
-            if bg == 'transparent':
-                bg = None
-
-            mask = options['file_mask'].get()
-            
-            if mask:
-                mask = np.array(Image.open(mask))
-                mask[mask==0] = 255
-                
-                self.wc = wc.WordCloud(background_color=bg, scale=3, mask=mask,
-                                              max_words=500, max_font_size=50,
-                                              mode='RGBA').generate_from_frequencies(names)
-                colors = wc.ImageColorGenerator(mask)
-                
-                ax.imshow(self.wc.recolor(color_func=colors), interpolation='bilinear')
-            else:
-                self.wc = wc.WordCloud(
-                    background_color=bg, width=700, height=500, scale=3, mode='RGBA').generate_from_frequencies(names)
-                ax.imshow(self.wc, interpolation='bilinear')
-
-            ax.set_axis_off()
-            return figure
-
-        except AttributeError:
-            message = 'The chosen column does not consist of strings.'
-            messagebox.showerror(title='Column Choice', message=message)
-            return None
-        except ValueError:
-            message = 'The chosen column does not consist of words.'
-            messagebox.showerror(title='Column Choice', message=message)
-            return None
-
-    def barplot(self, data, options, labels):
-        figure = plt.Figure(figsize=(7, 5))
-
-        groupby_column = options['column'].get()
-        number = options['categories'].get().strip()
-        number = int(number) if number.isdigit() else 10
-
-        # Data Manipulation
-        names = data.groupby(
-            groupby_column).count().iloc[:, 0].nlargest(number)
-
-        # Data Visualisation
-        ax = figure.add_subplot()
-        names.plot(kind='bar', ax=ax)
-
-        xlab = labels['xlab'].get()
-        ylab = labels['ylab'].get()
-
-        if xlab:
-            ax.set_xlabel(xlab)
-        if ylab:
-            ax.set_ylabel(ylab)
-
-        return figure
-
-    def icicle(self, data, options, labels):
-        return IciclePlot(self, data, options)
-
-    def line(self, data, options, labels):
+            self.notebook.forget(self)
+        except tk.TclError:
+            pass
+        self.destroy()
 
-        y_ax = options['y'].get()
-        groupby = options['groupby'].get()
-        # Data manipulation
-        figure, ax = plt.subplots()
-        lines = []
+    def line_hover(self, figure, options):
+        "Builds the hover annotation of a figure made by plotting.line, the figure itself carries no Tk callbacks"
+        y_ax = options['y']
+        ax = figure.axes[0]
         self.location = [0,0]
 
-        if groupby == 'None':
-            used_data = data[y_ax].value_counts()
-            used_data = used_data.sort_index(ascending=True)
-            lines, = ax.plot(used_data.index, used_data.values, marker='o')
-            annot = ax.annotate("", xy=(0,0), xytext=(-30,20),textcoords="offset points",
-                            bbox=dict(boxstyle="round", fc="w"),
-                            arrowprops=dict(arrowstyle="->"), clip_on=True)
-            annot.set_visible(False)
-        
+        if options.get('groupby', 'None') == 'None':
+            lines = ax.get_lines()[0]
         else:
-            for label, df in data.groupby(groupby):
-                used_data = df[y_ax].value_counts()
-                used_data = used_data.sort_index(ascending=True)
-
-                picker = (used_data.max()-used_data.min())/(len(used_data.index)*100)
+            lines = [[line, line.get_label()] for line in ax.get_lines()]
 
-
-                line, = ax.plot(used_data.index, used_data.values, label=label, marker='o', picker=1)
-                lines.append([line, label])
-                
-                annot = ax.annotate("", xy=(0,0), xytext=(-30,20),textcoords="offset points",
-                            bbox=dict(boxstyle="round", fc="w"),
-                            arrowprops=dict(arrowstyle="->"), clip_on=True)
-                annot.set_visible(False)
-
-            plt.legend()
+        annot = ax.annotate("", xy=(0,0), xytext=(-30,20),textcoords="offset points",
+                        bbox=dict(boxstyle="round", fc="w"),
+                        arrowprops=dict(arrowstyle="->"), clip_on=True)
+        annot.set_visible(False)
 
         def update_annot(ind, event=None, index=None):
             if isinstance(lines, list):
@@ -592,15 +936,7 @@ class NotebookTab(ttk.Frame):
                             annot.set_visible(False)
                             self.canvas.draw_idle()
                             
-        self.hover = hover                
-        return figure
-
-    def test(self, data, options, labels):
-        a = TestPlot(data, options)
-        if a.empty:
-            return None
-        else:
-            return a
+        return hover
 
 class LabelFrameInput(ttk.LabelFrame):
 
@@ -616,6 +952,9 @@ class LabelFrameInput(ttk.LabelFrame):
     widget_name - a string representaition of the type of widget to make (according to key)
 
     label - The label used to explain the widget. Placed to the left of the widget
+
+    The frames of the graph types are only built when a graph type is first selected. update() patches the option lists
+    of the existing widgets instead of building them again, unless the widgets themselves have changed.
     """
 
     key = {
@@ -635,12 +974,14 @@ class LabelFrameInput(ttk.LabelFrame):
         self.is_data = False
         self.inputs = inputs
         self.frames = None
+        self.widgets = None
         self.scroll = False
 
         if primary == 'graph_options':
 
             self.frames = {}
             self.values = {}
+            self.widgets = {}
 
             frame = ttk.Frame(self)
             graph_options_lab = ttk.Label(frame, text='Graph Type', width=15)
@@ -652,40 +993,42 @@ class LabelFrameInput(ttk.LabelFrame):
             graph_options_opt.pack(side=tk.RIGHT, fill=tk.X, expand=True)
             frame.pack(side=tk.TOP, fill=tk.X, padx=5, pady=(5, 2))
 
-            for i in options:
-                if i in inputs:
-                    if inputs[i] is None:
-                        continue
-                    data = self.create_frame(inputs[i])
-                    self.frames[i] = data[0]
-                    self.values[i] = data[1]
-
-            self.current = self.frames['Barplot']
+            # Only the frame of the graph type shown is built, the others are built when they are selected
+            self.frames[options[0]], self.values[options[0]], self.widgets[options[0]] = self.create_frame(inputs[options[0]])
+            self.current = self.frames[options[0]]
             self.current.pack(side=tk.TOP, fill=tk.X, padx=5)
 
         else:
 
             if primary == 'data_input':
                 top_frame = ttk.Frame(self)
-                str_var = tk.StringVar(value='No file selected')
-                filename = ttk.Label(top_frame, textvariable=str_var)
+                self.filename = tk.StringVar(value='No file selected')
+                filename = ttk.Label(top_frame, textvariable=self.filename)
                 data_input = ttk.Button(
-                    top_frame, text='Select data file', command=lambda: str_var.set(command()))
+                    top_frame, text='Select data file', command=command)
                 filename.pack(side=tk.BOTTOM, expand=True, anchor=tk.CENTER)
                 data_input.pack(fill='both')
 
                 bottom_frame = ttk.Frame(self)
                 filter_apply = ttk.Button(bottom_frame, text='Filter', command=alt_command[0])
                 filter_remove = ttk.Button(bottom_frame, text='Clear', command=alt_command[1])
+                filter_undo = ttk.Button(bottom_frame, text='Undo', command=alt_command[2])
 
                 filter_apply.pack(side=tk.LEFT, expand=True, padx=(5,2.5))
+                filter_undo.pack(side=tk.LEFT, expand=True, padx=2.5)
                 filter_remove.pack(side=tk.RIGHT, expand=True, padx=(2.5,5))
 
+                # Applied filter steps, double click a step to switch it off or on
+                self.history = tk.Listbox(self, height=3, activestyle='none')
+                self.history.bind('<Double-Button-1>',
+                                  lambda event: [alt_command[3](i) for i in self.history.curselection()])
+
                 top_frame.pack(side=tk.TOP, fill=tk.X, pady=5, padx=5)
                 bottom_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+                self.history.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
 
             if inputs is not None:
-                self.frames, self.values = self.create_frame(inputs)
+                self.frames, self.values, self.widgets = self.create_frame(inputs)
                 self.frames.pack(side=tk.TOP, fill=tk.X, padx=5)
             else:
                 pass
@@ -700,11 +1043,12 @@ class LabelFrameInput(ttk.LabelFrame):
         else:
             frame_master = ttk.Frame(self)
         
-        inputs = deepcopy(entries)
         entry_widget = {}
+        widgets = {}
 
-        for kwargs in inputs:
-            widget = kwargs.pop('kind')
+        for entry in entries:
+            kwargs = dict(entry)
+            widget = kind = kwargs.pop('kind')
             identity = kwargs.pop('id')
             frame = ttk.Frame(frame_master)
             label_str = kwargs.pop('label')
@@ -743,52 +1087,78 @@ class LabelFrameInput(ttk.LabelFrame):
             if not self.is_data:
                 widget.config(state='disabled')
 
+            widgets[identity] = (kind, widget)
             label.pack(side=tk.LEFT)
             widget.pack(side=tk.RIGHT, fill=tk.X, expand=True)
             frame.pack(fill=tk.X, pady=5)
 
         if self.scroll:
             frame_master.update()
-            return frame_top, entry_widget
+            return frame_top, entry_widget, widgets
         else:
-            return frame_master, entry_widget
+            return frame_master, entry_widget, widgets
+
+    def patch_frame(self, widgets, values, entries):
+        "Gives the existing widgets of a frame the option lists of entries and enables them once there is data"
+        for entry in entries:
+            kind, widget = widgets[entry['id']]
+
+            if kind == 'optionmenu':
+                options = entry['options']
+                current = values[entry['id']].get()
+                widget.set_menu(current if current in options else options[0], *options)
+            elif kind == 'combo':
+                widget.reset(values=entry.get('values'), loader=entry.get('loader'))
+
+            widget.config(state='normal' if self.is_data else 'disabled')
+
+    def same_widgets(self, widgets, entries):
+        "True when the widgets were made for the same ids and kinds as entries, so they can be patched"
+        return [(entry['id'], entry['kind']) for entry in entries] == [(key, val[0]) for key, val in widgets.items()]
 
     def update(self, name=None):
 
         if name is None:
 
             if type(self.frames) is dict:
-                name = self.graph_type.get()
-                self.values = {}
-
                 for i in self.frames:
-                    self.frames[i].destroy()
-                    self.frames[i], self.values[i] = self.create_frame(
-                        self.inputs[i])
-                    if i == name:
-                        self.current = self.frames[i]
-                        self.current.pack(side=tk.TOP, fill=tk.X, padx=5)
+                    self.patch_frame(self.widgets[i], self.values[i], self.inputs[i])
+
+            elif self.frames is not None and self.same_widgets(self.widgets, self.inputs):
+                self.patch_frame(self.widgets, self.values, self.inputs)
 
             else:
-                try:
+                if self.frames is not None:
                     self.frames.destroy()
-                    self.frames, self.values = self.create_frame(self.inputs)
-                    # if self.scroll:
-                    #     return True
-                    self.frames.pack(side=tk.TOP, fill=tk.X, padx=5)
-                except AttributeError:
-                    self.frames, self.values = self.create_frame(self.inputs)
-                    # if self.scroll:
-                    #     return True
-                    self.frames.pack(side=tk.TOP, fill=tk.X, padx=5)
+                self.frames, self.values, self.widgets = self.create_frame(self.inputs)
+                # if self.scroll:
+                #     return True
+                self.frames.pack(side=tk.TOP, fill=tk.X, padx=5)
 
         else:
             self.current.pack_forget()
 
+            if name not in self.frames and self.inputs.get(name) is not None:
+                self.frames[name], self.values[name], self.widgets[name] = self.create_frame(self.inputs[name])
+
             if name in self.frames:
                 self.current = self.frames[name]
                 self.current.pack(side=tk.TOP, fill=tk.X, padx=5)
 
+    def set_history(self, labels):
+        "Shows the labels of the applied filter steps in the history list"
+        self.history.delete(0, 'end')
+        for label in labels:
+            self.history.insert('end', label)
+
+    def get_values(self, name=None):
+        """Returns the current values of the widgets as a dictionary of plain values (strings and ints) instead of the
+        Tk variables and widgets in self.values. name selects the graph type for graph_options."""
+        values = self.values if name is None else self.values.get(name)
+        if values is None:
+            return None
+        return {key: val.get() for key, val in values.items()}
+
     def get_names(self, stringvar, combo, names):
         val = stringvar.get().strip()
         print(val)
@@ -834,368 +1204,159 @@ class LabelFrameInput(ttk.LabelFrame):
 
 
 class IciclePlot(tk.Canvas):
+    """
+    Canvas drawing an IcicleLayout. Clicking a rectangle selects it and everything below it, clicking it again
+    deselects them. The rectangles are found with a RectangleIndex, selecting changes the colours of the existing items.
+    The mouse wheel zooms in and out around the pointer, right clicking shows the whole plot again. Every zoom lays out
+    the visible part again with IcicleLayout.render, so zooming in shows the detail that was too small to draw.
+    Rectangles that appear when zooming in are selected when the rectangle above them is.
+
+    Layouts with more than image_items items are drawn offscreen with plotting.icicle_image and shown as a single image
+    item, which is drawn again when the selection changes. Hit testing uses the same RectangleIndex either way.
+    """
 
-    def __init__(self, master, data, inputs):
-        super().__init__(master=master)
-        # retype strings to integers and tuples:
-        options = inputs.copy()
-        Column = options['column'].get()
-        try:
-            
-            Height = options['height'].get().strip()
-            Width = options['width'].get().strip()
-            Height = int(Height) if Height.isdigit() else 700
-            Width = int(Width) if Width.isdigit() else 700
-
-            cutoff = options.pop('cutoff').get().strip()
-            min_char_width = options['min_char_width'].get()
-            cutoff = int(cutoff) if cutoff.isdigit() else 1
-            min_char_width = int(min_char_width) if min_char_width.isdigit() else 1
-        
-        except ValueError:
-            title = 'Incorrect Input'
-            message = 'cutoff, Height, Width or min_char_width was not coercable to int'
-            messagebox.showerror(title=title, message=message)
-        
-        # decode strings representing tuples:
-        bool_clrs_str = options['colours'].get().strip()
-        bool_clrs = literal_eval(f'[{bool_clrs_str}]')
-        options['bool_clrs'] = bool_clrs
-        
-        # decode strings representing names
-        bool_val_str = options['values'].get().strip()
-        bool_vals = bool_val_str.split(',')
-        
-        options['bool_vals'] = bool_vals
-        options['bool_clmn'] = options['bool_column'].get()
-
-        x = 0
-        y = 0
-        """
-        Does all the work for the name icicle plot except the recursion:
-        Sorts the names, determines how high 1 name is and how wide 1 character is,
-        creates a canvas
-
-        Arguments:
-        self: parent Window1 object
-        data: a list of names or pandas DataFrame.
-            If a DataFrame is given, name_clmn is used to decide what column to use for names.
-        width: width of desired canvas
-        height: height of desired canvas
-        x,y: coordinates of starting position. Useful for recursion and to make labels on the side
-        cutoff: determines the minimum number of names required to get a rect to actually display, minimum 1
-        min_char_width: determines a minimum width per character on the final graph, for if some names are extremely long
-        Column selects the column to use for plotting if the data is a DataFrame, can be int or string
-
-        Output:
-        memorydict: a dictionary containing the location and selectedness of all rectangles
-            example entry: 'Menno' : [(200,250,300,350), False, (255,0,255), 'no']
-            representing the square representing the names starting with Menno,
-            which spans from (200,250) to (300,350), which is not selected
-            All rectangles start out not selected
-            3rd entry is the colour of the rectangle
-            4th entry is the text in this rectangle
-        """
-
-        # get the name column from the dataframe if needed, sort stuff
-        if type(data) == pd.core.frame.DataFrame:
-            mask = data[Column].notnull().values
-            self.data = data.loc[mask]
-            self.data.sort_values(by=Column, inplace=True)
-            self.name_list = [str(x) for x in self.data[Column].values]
+    zoom_factor = 2
+    image_items = 2000
+
+    def __init__(self, master, layout, title=None, **kwargs):
+        super().__init__(master=master, width=layout.width, height=layout.height, **kwargs)
+        self.layout = layout
+        self.title = title
+        self.text_clr_func = layout.text_clr_func
+        self._from_rgb = layout._from_rgb
+        self.top = 0
+        self.bottom = layout.height
+        self.selected = set()
+        self.seen = set()
+        self.fills = {}   # item numbers of selected rectangles and labels with their colours
+
+        self.draw(layout.items, layout.memorydict)
+
+        self.bind("<ButtonPress-1>", self.Select)
+        self.bind("<ButtonPress-3>", lambda event: self.zoom_to(0, self.layout.height))
+        self.bind("<MouseWheel>", lambda event: self.zoom(event.y, self.zoom_factor if event.delta > 0 else 1/self.zoom_factor))
+        self.bind("<Button-4>", lambda event: self.zoom(event.y, self.zoom_factor))
+        self.bind("<Button-5>", lambda event: self.zoom(event.y, 1/self.zoom_factor))
+
+    def draw(self, items, memorydict):
+        self.delete('all')
+        self.items = items
+        self.memorydict = memorydict
+        self.fills = {}
+        self.image_mode = len(items) > self.image_items
+
+        if self.image_mode:
+            ids = [None] * len(items)
         else:
-            self.name_list = data
-            self.name_list.sort()
-
-        # sorting names and cleaning input
-        names = [name for name in self.name_list if name != "-1"]
-
-        # creating canvas
-        self.canvas = tk.Canvas(master, width=Width, height=Height)
-        self.canvas.bind("<ButtonPress-1>", self.Select)
-        Width = Width
-        Height = Height
-
-        # create an appropriate colour function:
-        self.clr_func = self.clr_func_definer(
-            data, 'b', mode='bool_blend', **options)
-
-        def black_or_white(clr):
-            """takes an input hexcode, returns the hex code for what will be more visible: black or white"""
-            nrs = "0123456789abcdef"
-            r = nrs.index(clr[1])*16+nrs.index(clr[2])
-            g = nrs.index(clr[3])*16+nrs.index(clr[4])
-            b = nrs.index(clr[5])*16+nrs.index(clr[6])
-
-            if r+g+b < 381:  # average value under 127
-                return("#ffffff")
-            else:
-                return("#000000")
-
-        self.text_clr_func = black_or_white
-
-        # determine height and width
-        height_per_name = Height/len(names)
-        width_per_char = max(Width/max(len(name)
-                             for name in names), min_char_width)
-
-        self.memorydict = self.NameIciclePlot(
-            names, width_per_char, height_per_name, x, y, Width, cutoff, self.data, **options)
-        self.canvas.pack(fill='both', expand=True)
-
-    def NameIciclePlot(self, names, width_per_char, height_per_name, x, y,
-                       outline, cutoff, data: list, topname="", recursioncounter=0, *args, **kwargs):
-        """Plots the icicle graphs by recursive function
-        topname is a variable storing the bit of each name cut off at the front, for later printing
-        recursioncounter is for testing purposes
-        outline is the width + 100, the point where names must have ended"""
-        memorydict = {}
-        last_name = names[0]
-        overlap = len(names[0])
-        nrnames = -1
-        for i in range(0, len(names)):
-            name = names[i]
-            nrnames += 1
-
-            new_overlap = 0
-            flag = False
-            for j in range(0, min(len(name), len(last_name))):
-                # this for loop finds the overlap this word has with the last word
-                if flag == False and name[j] == last_name[j]:
-                    new_overlap += 1
+            ids = []
+            for kind, coordinates, options in items:
+                if kind == 'rectangle':
+                    ids.append(self.create_rectangle(*coordinates, **options))
                 else:
-                    flag = True
-            # print(f"line 49, recursion: {recursioncounter}, data: {(names, overlap, new_overlap)}")
-            if new_overlap == 0:
-                # if there is no overlap, we will plot a rectangle representing the last group of words
-                end_x = x+(width_per_char*overlap)
-                end_y = y+(nrnames*height_per_name)
-                if nrnames >= cutoff:
-                    # any displaying will only happen if the cutoff is reached
-                    new_data = data[i-nrnames:i]
-                    rect_clr = self.clr_func(data=new_data, **kwargs)
-                    text_clr = self.text_clr_func(rect_clr)
-                    self.canvas.create_rectangle(
-                        x+1, y+1, end_x-1, end_y-1, fill=rect_clr)
-                    display_text = names[i-1][:overlap]
-                    self.canvas.create_text(x + 5, (y + end_y)/2,
-                                            text=display_text, anchor=tk.W, fill=text_clr)
-                    new_topname = topname + display_text
-                    memorydict[new_topname] = [
-                        (x+1, y+1, end_x-1, end_y-1), False, rect_clr, display_text]
-
-                    # then there is a recursion case: if the overlap wasn't total, recurse on the remaining characters
-                    newnames = names[i-nrnames:i]
-                    full_overlap = [
-                        name for name in newnames if len(name) == overlap]
-                        # required for displaying certain names on right side
-                    # print(f"line 59, recursion: {recursioncounter}, data: {(newnames, overlap)}")
-                    newnames = [name[overlap:] for name in newnames]
-                    # print(newnames)
-                    newnames = [name for name in newnames if len(name) > 0]
-                    # print(newnames)
-                    if len(newnames) > 0:
-                        new_memorydict = self.NameIciclePlot(newnames, width_per_char, height_per_name, end_x, y,
-                                            outline, cutoff, new_data, new_topname, recursioncounter + 1, **kwargs)
-                        memorydict.update(new_memorydict)
-                    # displaying name that was fully overlapped:
-                    if len(full_overlap) >= cutoff:
-                        mid_y = y + len(newnames)*height_per_name
-                        disp_text = topname + \
-                            full_overlap[0] + ' : ' + str(nrnames)
-                        self.canvas.create_text(
-                            outline, (mid_y + end_y)/2, text=disp_text, anchor=tk.E)
-                # reseting values
-                nrnames = 0
-                overlap = len(name)
-                new_overlap = overlap
-                y = end_y
-            # end of iteration updates
-            overlap = min(overlap, new_overlap)
-            last_name = name
-        # draw a rect for the final stuff:
-        nrnames += 1
-        end_x = x+(width_per_char*overlap)
-        end_y = y+(nrnames*height_per_name)
-        if nrnames >= cutoff:
-            new_data = data[len(names)-nrnames:len(names)]
-            rect_clr = self.clr_func(data=new_data, **kwargs)
-            text_clr = self.text_clr_func(rect_clr)
-            self.canvas.create_rectangle(
-                x+1, y+1, end_x-1, end_y-1, fill=rect_clr)
-            display_text = names[-1][:overlap]
-            self.canvas.create_text(
-                x + 5, (y + end_y)/2, text=display_text, anchor=tk.W, fill=text_clr)
-            new_topname = topname + display_text
-            memorydict[new_topname] = [
-                (x+1, y+1, end_x-1, end_y-1), False, rect_clr, display_text]
-
-            # recursion if needed
-            newnames = names[len(names)-nrnames:len(names)]
-
-            full_overlap = [name for name in newnames if len(name) == overlap]
-            # print(f"line 87, recursion: {recursioncounter}, data: {(newnames, overlap)}")
-            newnames = [name[overlap:] for name in newnames]
-            # print(newnames)
-            newnames = [name for name in newnames if len(name) > 0]
-            # print(newnames)
-            if len(newnames) > 0:
-                new_topname = topname + names[i-1][:overlap]
-                new_memorydict = self.NameIciclePlot(newnames, width_per_char, height_per_name, end_x, y,
-                                    outline, cutoff, new_data, new_topname, recursioncounter + 1, **kwargs)
-                memorydict.update(new_memorydict)
-            # displaying name that was fully overlapped:
-            if len(full_overlap) >= cutoff:
-                mid_y = y + len(newnames)*height_per_name
-                disp_text = topname+full_overlap[0] + ' : ' + str(nrnames)
-                self.canvas.create_text(
-                    outline, (mid_y + end_y)/2, text=disp_text, anchor=tk.E)
-        return(memorydict)
+                    ids.append(self.create_text(*coordinates, **options))
+
+        self.keys = list(memorydict)
+        self.index = RectangleIndex((memorydict[key][0] for key in self.keys), self.layout.height)
+        self.item_ids = {}
+
+        # memorydict is in drawing order, every rectangle comes after the one above it
+        above = []
+        for key in self.keys:
+            rect_number, text_number = memorydict[key][4]
+            self.item_ids[key] = (ids[rect_number], None if text_number is None else ids[text_number])
+
+            while above and not key.startswith(above[-1]):
+                above.pop()
+            if key not in self.seen and above and above[-1] in self.selected:
+                self.selected.add(key)
+            self.seen.add(key)
+            above.append(key)
+
+            if key in self.selected:
+                self.set_selected(key, True)
+
+        if self.image_mode:
+            self.paint()
+        elif self.title is not None:
+            self.create_text(0, 0, text=self.title)
+
+    def paint(self):
+        "Draws the items offscreen into one image item (image mode)"
+        self.delete('all')
+        self.photo = ImageTk.PhotoImage(icicle_image(self.layout, title=self.title, items=self.items, fills=self.fills))
+        self.create_image(0, 0, image=self.photo, anchor=tk.NW)
+
+    def save(self):
+        "Exports the plot as shown (zoom and selection) to an image or vector file"
+        filetypes = [('Portable Network Graphics', '.png'),
+                     ('Scalable Vector Graphics', '.svg'),
+                     ('Portable Document Format', '.pdf'),
+                     ('Joint Photographic Experts Group', '.jpg')]
+        filename = filedialog.asksaveasfilename(filetypes=filetypes, title='Select File Name',
+                                                defaultextension='.png', initialdir=os.getcwd())
+        if filename:
+            save(self.layout, filename, title=self.title, items=self.items, fills=self.fills)
+
+    def zoom(self, y, factor):
+        "Zooms in (factor > 1) or out around canvas height y, never further in than one name filling the canvas"
+        span = self.bottom - self.top
+        new_span = min(max(span/factor, self.layout.height_per_name), self.layout.height)
+        anchor = self.top + span*y/self.layout.height
+        top = anchor - new_span*y/self.layout.height
+        top = min(max(top, 0), self.layout.height - new_span)
+        self.zoom_to(top, top + new_span)
+
+    def zoom_to(self, top, bottom):
+        "Shows the part top:bottom (in canvas coordinates of the whole plot)"
+        if (top, bottom) == (self.top, self.bottom):
+            return
+        self.top, self.bottom = top, bottom
+        self.draw(*self.layout.render(top, bottom))
+
+    def highlight(self, clr):
+        "Lighter version of a colour, for selected rectangles"
+        clr = clr.lower()
+        nrs = "0123456789abcdef"
+        r = (nrs.index(clr[1])*16+nrs.index(clr[2])+50) % 255
+        g = (nrs.index(clr[3])*16+nrs.index(clr[4])+50) % 255
+        b = (nrs.index(clr[5])*16+nrs.index(clr[6])+50) % 255
+        return self._from_rgb((r, g, b))
+
+    def set_selected(self, key, selected):
+        "Selects or deselects the rectangle of key by changing the colours of its items"
+        rect = self.memorydict[key]
+        rect[1] = selected
+        if selected:
+            self.selected.add(key)
+        else:
+            self.selected.discard(key)
+
+        clr = self.highlight(rect[2]) if selected else rect[2]
+        rect_number, text_number = rect[4]
+        rect_id, text_id = self.item_ids[key]
+        for number, item_id, fill in ((rect_number, rect_id, clr), (text_number, text_id, self.text_clr_func(clr))):
+            if number is None:
+                continue
+            if selected:
+                self.fills[number] = fill
+            else:
+                self.fills.pop(number, None)
+            if item_id is not None:
+                self.itemconfigure(item_id, fill=fill)
 
     def Select(self, event):
-        """Selects the square which is clicked"""
-        for rect_key in self.memorydict.keys():
-            rect = self.memorydict[rect_key]
-            loc_tup = rect[0]
-            if event.x > loc_tup[0] and event.x < loc_tup[2] and event.y > loc_tup[1] and event.y < loc_tup[3]:
-                if rect[1] == False:
-                    clr = rect[2].lower()
-                    nrs = "0123456789abcdef"
-                    r = (nrs.index(clr[1])*16+nrs.index(clr[2])+50) % 255
-                    g = (nrs.index(clr[3])*16+nrs.index(clr[4])+50) % 255
-                    b = (nrs.index(clr[5])*16+nrs.index(clr[6])+50) % 255
-                    new_clr = self._from_rgb((r, g, b))
-                    self.canvas.create_rectangle(
-                        loc_tup[0], loc_tup[1], loc_tup[2], loc_tup[3], fill=new_clr)
-                    text_clr = self.text_clr_func(new_clr)
-                    self.canvas.create_text(loc_tup[0]+5, (loc_tup[1]+loc_tup[3])/2,
-                                            text=rect[3], anchor=tk.W, fill=text_clr)
-                    rect[1] = True
-
-                elif rect[1] == True:
-                    self.canvas.create_rectangle(
-                        loc_tup[0], loc_tup[1], loc_tup[2], loc_tup[3], fill=rect[2])
-                    text_clr = self.text_clr_func(rect[2])
-                    self.canvas.create_text(loc_tup[0]+5, (loc_tup[1]+loc_tup[3])/2,
-                                            text=rect[3], anchor=tk.W, fill=text_clr)
-                    rect[1] = False
-        # todo: make it work on children of selected node
- 
-    def clr_func_definer(self, dat, main_clr : str, mode : str, 
-                     bool_clrs : list = None, bool_clmn : str = None, bool_vals : list = None, **kwargs):
-      """Returns a colour function used to colour in a graph
-
-      Arguments:
-      dat: the dataframe that will be used for the graph
-      main_clr: the main colour used. 'r' for red, 'g' for green or 'b' for blue.
-      mode: what mode is used to turn the data into a colour. 
-          Supported modes: 
-          bool: a set of values and colorrs is given. 
-              For each rect, the colour is that of the value that occurs most in this rect
-          bool_blend: a set of values and colours is given
-              For each rect, the colour is the weighted average of colours given, weights being how often each name occurs
-      bool_clrs: a list of rgb tuples for colours for each value, only required in bool mode
-      bool_clmn: the column in the dataframe containing the values worked on, only required in bool mode
-      bool_vals: the values to check for, only required in bool mode
-      """
-
-      convert_main_clr_dict = {'r' : 0, 'g': 1,'b' : 2}
-      main_index = convert_main_clr_dict[main_clr]
-
-      if mode == 'bool' or mode == 'bool_blend': #creates a bool or bool_blend mode function
-          # catching invalid input for bool or bool_blend modes:
-          for item in [bool_clrs, bool_clmn, bool_vals]:
-              if item == None:
-                  raise TypeError('bool_clrs, bool_clmn or bool_vals missing while in bool mode')
-          if len(bool_clrs) != len(bool_vals):
-              raise Exception("""bool_clrs and bool_vals were not of equal length. 
-                              clr_func_definer requires an identical number of colours and values in bool mode.""")
-
-          if mode == 'bool':
-              # actual defining of bool function:
-              def clr_func(data, none_clr = (127,127,127), **kwargs):
-                  f"""Colour function finding the most common value of {bool_vals} in the input dataframe in column {bool_clmn}
-                  and returning the value in {bool_clrs} of the same index.
-                  Arguments:
-                  data: input dataframe containing a column named {bool_clmn}
-                  except_clr: the colour to be output when none of the values in {bool_vals} are encountered"""
-                  # counting occurences of each value:
-                  # print(data.loc[:,['firstname', 'gender']])
-                  nr_counts = {"" : 0}
-                  for val in bool_vals:
-                      nr_counts[val] = 0
-                  for item in data[bool_clmn]:
-                      try:
-                          nr_counts[item] += 1
-                      except:
-                          pass
-                  # determining the most common occurence, prefering values given later by dict.keys:
-                  largest = max(nr_counts, key = nr_counts.get) 
-                  if largest == "":
-                      return(self._from_rgb(none_clr))
-                  # finds correct colour tuple:
-                  clr = bool_clrs[bool_vals.index(largest)]
-                  # print(clr)
-                  return(self._from_rgb(clr))
-          elif mode == 'bool_blend':
-              # actual definition of bool_blend function:
-              def clr_func(data, none_clr = (127,127,127), **kwargs):
-                  f"""
-                  Colour function giving a weighted average of the colours in {bool_clrs}, 
-                  the weights being the number of occurences of {bool_vals} with the same index in {bool_clmn}
-                  Arguments:
-                  data: input dataframe containing a column named {bool_clmn}
-                  except_clr: the colour to be output when none of the values in {bool_vals} are encountered
-                  """
-                  nr_counts = {}
-                  # counting occurences of each value:
-                  # print(data.loc[:,['firstname', 'gender']])
-                  for val in bool_vals:
-                      nr_counts[val] = 0
-                  for item in data[bool_clmn]:
-                      try:
-                          nr_counts[item] += 1
-                      except:
-                          pass
-                  # making a weighted average:
-                  r,g,b = 0,0,0
-                  counter = 0
-                  for val in bool_vals:
-                      # for each value, add the nr of occurences * colour strength to the total colour, 
-                      # and add nr of occurences to the counter
-                      r += bool_clrs[bool_vals.index(val)][0]*nr_counts[val]
-                      g += bool_clrs[bool_vals.index(val)][1]*nr_counts[val]
-                      b += bool_clrs[bool_vals.index(val)][2]*nr_counts[val]
-                      counter += nr_counts[val]
-                      # print(r,g,b,counter)
-                  if counter > 0:
-                      # zeroDivision failsafe: if no values encountered, return none_clr
-                      r = int(r/counter)
-                      g = int(g/counter)
-                      b = int(b/counter)
-                      return(self._from_rgb((r,g,b)))
-                  else:
-                      return(self._from_rgb(none_clr))
-                  # print(r,g,b)
-                  # print(nr_counts)
-
-              return(clr_func)
-
-
-      # default colour function only giving 255 for main_clr
-      def clr_func(**kwargs):
-          clr = [0,0,0]
-          clr[main_index] = 255
-          # print(clr)
-          clr = tuple(clr)
-          return(self._from_rgb(clr))
-      return(clr_func)
-
-    def _from_rgb(self, rgb):
-        """translates an rgb tuple of int to a tkinter friendly color code
-        """
-        return "#%02x%02x%02x" % rgb
+        """Selects the square which is clicked and the squares below it, or deselects them when it was selected"""
+        number = self.index.find(event.x, event.y)
+        if number is None:
+            return
 
+        selected = not self.memorydict[self.keys[number]][1]
+        for other in self.index.subtree(number):
+            self.set_selected(self.keys[other], selected)
+
+        if self.image_mode:
+            self.paint()
+ 
 
 ######### IGNORE ###########
 
@@ -1215,11 +1376,10 @@ class TestPlot(plt.Figure):
         colors = False
         ax = self.add_subplot(projection='polar')
 
-        lv_list = [options[f'lv_{i}'].get() for i in range(1,6) if options[f'lv_{i}'].get() != 'Not Available']
+        lv_list = [options[f'lv_{i}'] for i in range(1,6) if options[f'lv_{i}'] != 'Not Available']
         
         if len(lv_list) == 0:
-            messagebox.showerror('Column Selection', 'No columns selected for visualisation')
-            self.empty = True
+            raise PlotError('Column Selection', 'No columns selected for visualisation')
         else:
             tree = self.get_list(data, lv_list)
             self.sunburst(tree, ax=ax, colors=colors)
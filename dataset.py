@@ -0,0 +1,581 @@
+"""
+Data layer of the application: reading csv files into compressed dataframes, the on disk DatasetCache, and filtering
+with DataView and FilterHistory. Like plotting, it does not use Tk, so the command line can read data on servers
+without a display (or a Python without tkinter).
+"""
+import pandas as pd
+import numpy as np
+
+from contextlib import closing
+import os
+import json
+import time
+import hashlib
+import threading
+import itertools
+import csv
+import re
+
+def compress_dataframe(dataframe, category_limit=20, float_tolerance=1e-6, report=True):
+    """
+    Compress dataframe inplace, mainly for floats, ints and categorical variables
+
+    The min, max and null statistics of all numeric columns are computed in one go, after which every column is cast to
+    the smallest type that holds its values:
+    - ints are downcast to int8/int16/int32
+    - floats that only hold whole numbers become (nullable) ints when they fit int32 and are kept otherwise, other
+      floats become float32 when that changes no value by more than float_tolerance (relative)
+    - object columns with at most category_limit distinct values become categorical. Counting the distinct values stops
+      as soon as the limit is passed
+
+    Returns a report dataframe with the dtype and memory usage in bytes of every column before and after compressing,
+    or None when report is False.
+    """
+    if report:
+        dtypes_before = dataframe.dtypes.astype(str)
+        bytes_before = dataframe.memory_usage(deep=True, index=False)
+
+    ints = dataframe.select_dtypes('int64')
+    if len(ints.columns):
+        minimum, maximum = ints.min(), ints.max()
+        for column in ints.columns:
+            dtype = _smallest_int(minimum[column], maximum[column])
+            if dtype is not None:
+                dataframe[column] = dataframe[column].values.astype(dtype)
+
+    floats = dataframe.select_dtypes('float64')
+    if len(floats.columns):
+        minimum, maximum, nulls = floats.min(), floats.max(), floats.isna().sum()
+        for column in floats.columns:
+            values = dataframe[column].values
+            if nulls[column] == len(values):
+                continue
+
+            if np.array_equal(np.trunc(values), values, equal_nan=True):
+                dtype = _smallest_int(minimum[column], maximum[column])
+                if dtype is not None:
+                    dtype = dtype.capitalize() if nulls[column] else dtype   # nullable int when there are NaNs
+                    dataframe[column] = dataframe[column].astype(dtype)
+                # Whole numbers too large for int32 stay float64, float32 would merge neighbouring values (e.g. ids)
+                continue
+
+            if max(abs(minimum[column]), abs(maximum[column])) < np.finfo('float32').max:
+                single = values.astype('float32')
+                if np.allclose(single, values, rtol=float_tolerance, atol=0, equal_nan=True):
+                    dataframe[column] = single
+
+    for column in dataframe.select_dtypes('object').columns:
+        if _few_unique(dataframe[column], category_limit):
+            dataframe[column] = dataframe[column].astype('category')
+
+    if report:
+        return pd.DataFrame({
+            'dtype_before': dtypes_before,
+            'dtype_after': dataframe.dtypes.astype(str),
+            'bytes_before': bytes_before,
+            'bytes_after': dataframe.memory_usage(deep=True, index=False)
+        })
+
+def _smallest_int(minimum, maximum):
+    "Name of the smallest int type able to hold values between minimum and maximum, None if that is int64"
+    for dtype in ('int8', 'int16', 'int32'):
+        info = np.iinfo(dtype)
+        if minimum >= info.min and maximum <= info.max:
+            return dtype
+    return None
+
+def _few_unique(series, limit, block=65536):
+    "True when the series has at most limit distinct values. Works through the series in blocks and stops early"
+    seen = set()
+    for start in range(0, len(series), block):
+        seen.update(series.iloc[start:start+block].dropna().unique())
+        if len(seen) > limit:
+            return False
+    return True
+
+def combine_reports(reports, dataframe):
+    """
+    Combines the compress_dataframe reports of the chunks of a file into one report for the final dataframe. The bytes
+    before compressing are summed over the chunks, the dtypes and bytes after compressing come from the dataframe.
+    """
+    report = pd.DataFrame({
+        'dtype_before': reports[0]['dtype_before'],
+        'dtype_after': dataframe.dtypes.astype(str),
+        'bytes_before': sum(report['bytes_before'] for report in reports),
+        'bytes_after': dataframe.memory_usage(deep=True, index=False)
+    })
+    return report
+
+def read_csv_chunks(filename, chunksize=100000, reports=None):
+    """
+    Generator that reads a csv file in chunks. Every chunk is compressed with compress_dataframe before it is yielded,
+    so the uncompressed data never has to be held in memory at once. Closing the generator closes the file.
+    When a list is given as reports, the compress report of every chunk is appended to it.
+
+    Yields tuples of (fraction of the file read, compressed chunk)
+    """
+    size = os.path.getsize(filename) or 1
+
+    with open(filename, 'rb') as data_file:
+        for chunk in pd.read_csv(data_file, encoding='utf-8', chunksize=chunksize):
+            report = compress_dataframe(chunk, report=reports is not None)
+            if reports is not None:
+                reports.append(report)
+            fraction = min(data_file.tell()/size, 1)
+            yield fraction, chunk
+
+def concat_chunks(chunks, category_limit=20):
+    """
+    Concatenates compressed chunks into one dataframe. Categorical columns are combined with union_categoricals so they
+    stay categorical even when the chunks saw different categories, with the categories sorted as a single read gives.
+    Combined columns with more than category_limit categories become object again, and the result is compressed once
+    more, as a column can be categorical in one chunk and object in another. So the dtypes follow the same rules as
+    compressing the whole file at once.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+
+    categories = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            categories[column] = pd.api.types.union_categoricals(parts, sort_categories=True, ignore_order=True)
+
+    dataframe = pd.concat(chunks, ignore_index=True)
+    for column, values in categories.items():
+        if len(values.categories) > category_limit:
+            values = values.astype(object)
+        dataframe[column] = values
+
+    compress_dataframe(dataframe, category_limit=category_limit, report=False)
+    return dataframe
+
+def read_dataset(filename, cache=None, state=None, cancelled=None):
+    """
+    Reads a csv file in compressed chunks, or loads it from a DatasetCache when it was read before. The progress is
+    written to the 'fraction' and 'text' keys of the state dictionary, cancelled is a function telling whether to stop.
+
+    Returns (dataframe, report), or None when cancelled.
+    """
+    state = {} if state is None else state
+    name = os.path.basename(filename)
+
+    if cache is not None:
+        state['text'] = f'Checking cache for {name}'
+        cached = cache.load(filename, state, cancelled)
+        if cached is not None:
+            state['fraction'] = 1
+            return cached
+        if cancelled is not None and cancelled():
+            return None
+
+    state['fraction'] = 0
+    state['text'] = f'Reading {name}'
+    chunks = []
+    reports = []
+    with closing(read_csv_chunks(filename, reports=reports)) as reader:
+        for fraction, chunk in reader:
+            if cancelled is not None and cancelled():
+                return None
+            chunks.append(chunk)
+            state['fraction'] = fraction
+
+    state['fraction'] = 1
+    state['text'] = f'Combining {name}'
+    if not chunks:
+        return pd.DataFrame(), None
+    data = concat_chunks(chunks)
+    report = combine_reports(reports, data)
+
+    if cache is not None:
+        try:
+            cache.store(filename, data, report)
+        except OSError:
+            pass   # Not being able to cache the data should not stop it from being used
+    return data, report
+
+class DataView:
+    """
+    Filtered view on a base dataframe, which is never changed or copied. The filter is kept as a boolean mask over the
+    rows of base (None means all rows). The filtered dataframe is only made when frame() is called, e.g. for a plot,
+    and is kept until the view is thrown away. Filtering returns a new view, so views can be shared between threads.
+    """
+
+    def __init__(self, base, mask=None, version=None):
+        self.base = base
+        self.mask = mask
+        self.version = version
+        self._frame = None
+        self._key = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        if self.mask is None:
+            return len(self.base.index)
+        return int(np.count_nonzero(self.mask))
+
+    @property
+    def positions(self):
+        "Positions of the rows of base that are in the view"
+        if self.mask is None:
+            return np.arange(len(self.base.index))
+        return np.flatnonzero(self.mask)
+
+    def where(self, mask):
+        "New view keeping only the rows of this view for which mask (over all rows of base) is True"
+        mask = np.asarray(mask, dtype=bool)
+        if self.mask is not None:
+            mask = mask & self.mask
+        return DataView(self.base, mask, self.version)
+
+    def limit(self, rows):
+        "New view keeping only the first rows of this view"
+        mask = np.zeros(len(self.base.index), dtype=bool)
+        mask[self.positions[:rows]] = True
+        return DataView(self.base, mask, self.version)
+
+    def key(self):
+        """(dataset version, filter state) identifying the rows of the view, e.g. to cache aggregations of them.
+        None when the view has no version"""
+        if self.version is None:
+            return None
+        if self._key is None:
+            digest = None if self.mask is None else hashlib.blake2b(np.packbits(self.mask), digest_size=16).hexdigest()
+            self._key = (self.version, digest)
+        return self._key
+
+    def frame(self):
+        "The filtered dataframe, made on the first call"
+        if self.mask is None:
+            return self.base
+
+        with self._lock:
+            if self._frame is None:
+                frame = self.base.take(self.positions)
+                frame.index = pd.RangeIndex(len(frame.index))
+                self._frame = frame
+            return self._frame
+
+def parse_filter(column, text, series=None):
+    """
+    Turns the text typed in a filter box into a filter dictionary for filter_mask. Supported forms:
+
+    value1, value2     remove the rows with these values (the default, filter boxes are blacklists)
+    =value1, value2    only keep the rows with these values
+    /regex/            remove the rows whose value matches the regex, =/regex/ only keeps them
+    low..high          only keep the rows with a value between low and high (inclusive), either side may be left out
+
+    Values containing commas can be quoted: "Smith, John", Doe. When series (the column) is given, a text that is
+    exactly one of its values is always that value, so values picked from the autocompletion are filtered as they are.
+
+    Raises ValueError when = is not followed by any value, re.error when the regex can not be compiled.
+    """
+    text = text.strip()
+    keep = text.startswith('=')
+    if keep:
+        text = text[1:].strip()
+        if not text:
+            raise ValueError('= should be followed by the values to keep.')
+
+    if series is not None and re.search(r'[,"/]|\.\.', text) and _is_value(series, text):
+        return dict(column=column, kind='values', values=[text], keep=keep)
+
+    if len(text) > 1 and text.startswith('/') and text.endswith('/'):
+        return dict(column=column, kind='regex', pattern=re.compile(text[1:-1]), keep=keep)
+
+    if '..' in text and not text.startswith('"'):
+        low, high = (part.strip() for part in text.split('..', 1))
+        return dict(column=column, kind='range', low=low or None, high=high or None, keep=True)
+
+    values = [value.strip() for value in next(csv.reader([text], skipinitialspace=True)) if value.strip()]
+    return dict(column=column, kind='values', values=values, keep=keep)
+
+def _is_value(series, text):
+    "True when text is the string of one of the values of a (non numeric) series"
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return False
+    return bool(_lookup_hits(series, lambda uniques: uniques.astype(str) == text).any())
+
+def filter_mask(base, filters):
+    """
+    Combines all filters (see parse_filter) into one boolean mask over the rows of base.
+
+    Numeric columns are compared in their own dtype. For categorical and text columns the filter is only evaluated on
+    the distinct values, and mapped back to the rows through the category codes (or codes from pd.factorize), so the
+    column itself is never converted to strings.
+    """
+    mask = np.ones(len(base.index), dtype=bool)
+
+    for item in filters:
+        series = base[item['column']]
+        numeric = pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+        if numeric and item['kind'] != 'regex':
+            hits = _numeric_hits(series, item)
+        else:
+            hits = _lookup_hits(series, lambda uniques: _unique_hits(uniques, item))
+
+        mask &= hits if item['keep'] else ~hits
+
+    return mask
+
+def _numeric_hits(series, item):
+    "Rows of a numeric series that match the values or range of the filter"
+    if item['kind'] == 'values':
+        values = pd.to_numeric(pd.Series(item['values'], dtype=object), errors='coerce').dropna()
+        hits = series.isin(values.values)
+    else:
+        hits = np.ones(len(series.index), dtype=bool)
+        if item['low'] is not None:
+            hits &= (series >= float(item['low'])).fillna(False).values
+        if item['high'] is not None:
+            hits &= (series <= float(item['high'])).fillna(False).values
+    return np.asarray(hits, dtype=bool)
+
+def _unique_hits(uniques, item):
+    "Distinct values (a pandas Index) that match the filter"
+    if item['kind'] == 'regex':
+        return uniques.astype(str).str.contains(item['pattern'], regex=True)
+
+    if item['kind'] == 'values':
+        return uniques.astype(str).isin(item['values'])
+
+    if pd.api.types.is_numeric_dtype(uniques.dtype):
+        low = -np.inf if item['low'] is None else float(item['low'])
+        high = np.inf if item['high'] is None else float(item['high'])
+        return (uniques >= low) & (uniques <= high)
+
+    uniques = uniques.astype(str)
+    hits = np.ones(len(uniques), dtype=bool)
+    if item['low'] is not None:
+        hits &= uniques >= item['low']
+    if item['high'] is not None:
+        hits &= uniques <= item['high']
+    return hits
+
+def _lookup_hits(series, test):
+    """Applies test to the distinct values of series and maps the result back to the rows with integer codes. Missing
+    values (code -1) never match"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.values, series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Index(uniques)
+
+    hits = np.append(np.asarray(test(uniques), dtype=bool), False)
+    return hits[codes]
+
+# Every dataset that is loaded gets a new version, so cached aggregations of an older dataset are never used for it
+dataset_versions = itertools.count(1)
+
+class FilterHistory:
+    """
+    Stack of filter steps over a base dataframe, so filters can be undone or switched off one at a time.
+
+    Every step caches its own mask (the filters of that step evaluated on base) and the combined mask of all active steps
+    up to and including it. Undoing the last step just drops it, toggling a step only recombines the cached masks from
+    that step onwards; no filter is evaluated on the data again.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.version = next(dataset_versions)
+        self.steps = []
+
+    @staticmethod
+    def make_step(base, filters, rows=None, text=''):
+        """Evaluates the filters of a new step on base. This is the expensive part, which does not change the history,
+        so it can run on a worker thread before the step is pushed"""
+        mask = filter_mask(base, filters) if filters else None
+        return dict(mask=mask, rows=rows, text=text, active=True, combined=None)
+
+    def push(self, step):
+        self.steps.append(step)
+        self._combine(len(self.steps) - 1)
+
+    def undo(self):
+        "Removes the last step, returns False when there was nothing to undo"
+        if not self.steps:
+            return False
+        self.steps.pop()
+        return True
+
+    def toggle(self, index):
+        "Switches a step off or back on"
+        self.steps[index]['active'] = not self.steps[index]['active']
+        self._combine(index)
+
+    def clear(self):
+        self.steps = []
+
+    def view(self):
+        "DataView with the combined mask of all active steps"
+        if not self.steps:
+            return DataView(self.base, version=self.version)
+        return DataView(self.base, self.steps[-1]['combined'], self.version)
+
+    def labels(self):
+        return [step['text'] if step['active'] else f"(off) {step['text']}" for step in self.steps]
+
+    def _combine(self, start):
+        "Recomputes the combined masks from step start onwards out of the cached masks"
+        combined = self.steps[start-1]['combined'] if start > 0 else None
+
+        for step in self.steps[start:]:
+            if step['active']:
+                view = DataView(self.base, combined)
+                if step['mask'] is not None:
+                    view = view.where(step['mask'])
+                if step['rows'] is not None:
+                    view = view.limit(step['rows'])
+                combined = view.mask
+            step['combined'] = combined
+
+class DatasetCache:
+    """
+    On disk cache of datasets that have been read and compressed, so opening the same csv again skips parsing and
+    compressing. The dataframe is stored with pickle, which keeps the compressed dtypes (categoricals, nullable ints).
+
+    Entries are keyed by a hash of the file content. The index remembers the path, size and modification time of the files
+    that have been hashed, so a file is only hashed again when it has changed. When the cache grows beyond max_bytes the
+    least recently used entries are removed.
+
+    The cache can be used from worker threads.
+    """
+
+    version = 2   # Increase when the stored format or the compression changes, which invalidates all old entries
+
+    def __init__(self, directory=None, max_bytes=4*2**30):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.cache', 'vis_project')
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(directory, 'index.json')
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as index_file:
+                self.index = json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            self.index = {'files': {}, 'entries': {}}
+
+    def key(self, filename, state=None, cancelled=None):
+        """Content hash of the file, only computed when the size or modification time differs from the last time.
+        While hashing the progress is written to state['fraction'], None is returned when cancelled() becomes True"""
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+
+        with self.lock:
+            known = self.index['files'].get(path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime:
+            return known[2]
+
+        digest = hashlib.blake2b(str(self.version).encode(), digest_size=20)
+        done = 0
+        with open(path, 'rb') as data_file:
+            for block in iter(lambda: data_file.read(2**20), b''):
+                if cancelled is not None and cancelled():
+                    return None
+                digest.update(block)
+                done += len(block)
+                if state is not None:
+                    state['fraction'] = min(done / (stat.st_size or 1), 1)
+        key = digest.hexdigest()
+
+        with self.lock:
+            self.index['files'][path] = [stat.st_size, stat.st_mtime, key]
+            self._save()
+        return key
+
+    def load(self, filename, state=None, cancelled=None):
+        """Returns the cached (dataframe, compress report) of the file, or None when it is not in the cache (or cancelled()
+        became True while hashing the file, see key)"""
+        key = self.key(filename, state, cancelled)
+        with self.lock:
+            if key is None or key not in self.index['entries']:
+                return None
+            self.index['entries'][key]['used'] = time.time()
+            self._save()
+
+        try:
+            return pd.read_pickle(self._entry_file(key))
+        except Exception:
+            # a missing, truncated or incompatible (e.g. other pandas version) pickle is a miss
+            self.remove(key)
+            return None
+
+    def path(self, filename):
+        """
+        Path of the pickle with the cached (dataframe, compress report) of the file, or None when it is not cached.
+        Other processes can read it with pd.read_pickle without going through (and writing) the index.
+        """
+        key = self.key(filename)
+        with self.lock:
+            if key not in self.index['entries']:
+                return None
+        return self._entry_file(key)
+
+    def store(self, filename, data, report=None):
+        "Stores the dataframe (and its compress report) for the file and removes old entries when the cache is too large"
+        key = self.key(filename)
+        entry_file = self._entry_file(key)
+        temp_file = f'{entry_file}.{threading.get_ident()}.tmp'
+        pd.to_pickle((data, report), temp_file)
+        os.replace(temp_file, entry_file)
+
+        with self.lock:
+            self.index['entries'][key] = {'bytes': os.path.getsize(entry_file), 'used': time.time()}
+            self._evict(keep=key)
+            self._save()
+
+    def invalidate(self, filename=None):
+        "Removes the entry of the file from the cache, or every entry when no filename is given"
+        if filename is None:
+            with self.lock:
+                keys = list(self.index['entries'])
+        else:
+            with self.lock:
+                known = self.index['files'].get(os.path.abspath(filename))
+            keys = [] if known is None else [known[2]]
+
+        for key in keys:
+            self.remove(key)
+
+    def remove(self, key):
+        with self.lock:
+            self.index['entries'].pop(key, None)
+            self.index['files'] = {path: known for path, known in self.index['files'].items() if known[2] != key}
+            self._save()
+        try:
+            os.remove(self._entry_file(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        "Removes least recently used entries until the cache fits in max_bytes. Call with the lock held"
+        entries = self.index['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+
+        for key in sorted(entries, key=lambda key: entries[key]['used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)['bytes']
+            self.index['files'] = {path: known for path, known in self.index['files'].items() if known[2] != key}
+            try:
+                os.remove(self._entry_file(key))
+            except FileNotFoundError:
+                pass
+
+    def _entry_file(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def _save(self):
+        "Writes the index to disk. Call with the lock held"
+        temp_file = f'{self.index_file}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as index_file:
+            json.dump(self.index, index_file)
+        os.replace(temp_file, self.index_file)
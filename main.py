@@ -1,248 +1,182 @@
-# Tkinter libraries
-import tkinter as tk
-from tkinter import ttk, font, filedialog, messagebox
-from custom_tkinter import LabelFrameInput, CustomNotebook, NotebookTab, DataTable, compress_dataframe
+"""
+Entry point of the application. Without arguments the GUI is opened, with the render or batch command plots are made
+from the command line (see cli), which only needs the Tk-free dataset and plotting modules.
+"""
+from dataset import DatasetCache, read_dataset
 
-# Other libraries
-from pandas import read_csv
+import pandas as pd
 import os
-import numpy as np
-import gc
-
-class MainWindow(ttk.Frame):
-
-    def __init__(self, master, **kw):
-        """ Creates the frame for the main window of the application. It consists of 3 subframes: 
-        The left frame(input), midframe(plots), and the right frame(output)
-        """
-        super().__init__(master, **kw)
-
-        self.left_frame = ttk.Frame(self)
-        self.mid_frame = ttk.Frame(self)
-        self.bottom_frame = ttk.Frame(self, height=205)
-        self.base = None
-        self.data = None
-
-        """
-        Left frame widgets
-        """
-        # Data entry
-
-        self.data_input = LabelFrameInput(self.left_frame, None, 'data_input',
-                                          command=self.get_data, alt_command=[self.filter_data, self.clear_filter],
-                                          text='Data entry and preprocessing')
-
-        # Graph Options
-        barplot_widgets = [
-            {'kind': 'optionmenu', 'label': 'Column',
-                'options': ['Not available'], 'id': 'column'},
-            {'kind': 'entry', 'label': 'Nr. of categories', 'id': 'categories', 'validate':'int'}
-        ]
-
-        wordcloud_widgets = [
-            {'kind': 'optionmenu', 'label': 'Column',
-                'options': ['Not available'], 'id': 'column'},
-            {'kind': 'optionmenu', 'label': 'BG color', 'options': [
-                'White', 'Black', 'Transparent'], 'id': 'bg'},
-            {'kind': 'entry', 'label': 'Filter', 'id': 'filter'},
-            {'kind': 'button', 'label': 'Image Mask', 'command': 'file', 'id': 'file_mask', 'text': 'Select File'}
-        ]
-
-        icicle_widgets = [
-            {'kind': 'optionmenu', 'label': 'Column',
-                'options': ['Not Available'], 'id': 'column'},
-            {'kind': 'entry', 'label': 'Cutoff', 'id': 'cutoff'},
-            {'kind': 'entry', 'label': 'Width', 'id': 'width'},
-            {'kind': 'entry', 'label': 'Height', 'id': 'height'},
-            {'kind': 'entry', 'label': 'Min Char Width', 'id': 'min_char_width'},
-            {'kind': 'entry', 'label': 'Colours', 'id': 'colours'},
-            {'kind': 'entry', 'label': 'Values', 'id': 'values'},
-            {'kind': 'optionmenu', 'label': 'Bool column',
-                'options': ['Not Available'], 'id': 'bool_column'}
-        ]
-
-        line_widgets = [
-            {'kind': 'optionmenu', 'label': 'Y Axis',
-                'options': ['Not Available'], 'id': 'y'},
-            {'kind': 'optionmenu', 'label': 'Group By',
-                'options': ['Not Available'], 'id': 'groupby'}
-        ]
-        
-        test_widgets = [
-            {'kind': 'optionmenu', 'label': 'Level 1', 'options': ['Not Available'], 'id': 'lv_1'},
-            {'kind': 'optionmenu', 'label': 'Level 2', 'options': ['Not Available'], 'id': 'lv_2'},
-            {'kind': 'optionmenu', 'label': 'Level 3', 'options': ['Not Available'], 'id': 'lv_3'},
-            {'kind': 'optionmenu', 'label': 'Level 4', 'options': ['Not Available'], 'id': 'lv_4'},
-            {'kind': 'optionmenu', 'label': 'Level 5', 'options': ['Not Available'], 'id': 'lv_5'}
-        ]
-        
-        graph_options = {
-            'Barplot': barplot_widgets,
-            'Wordcloud': wordcloud_widgets,
-            'Line': line_widgets,
-            'Icicle': icicle_widgets,
-            # 'Test': test_widgets
-        }
-        
-
-        self.graph_options = LabelFrameInput(self.left_frame, graph_options, text='Graph Options', primary='graph_options')
-
-        # Plot labels
-        plot_labels = [
-            {'kind': 'entry', 'label': 'Title', 'id': 'title'},
-            {'kind': 'entry', 'label': 'Subtitle', 'id': 'subtitle'},
-            {'kind': 'entry', 'label': 'Y Label', 'id': 'ylab'},
-            {'kind': 'entry', 'label': 'X Label', 'id': 'xlab'},
-            {'kind': 'checkbutton', 'label': 'xkcd', 'id': 'xkcd'}
-        ]
-        self.plot_labels = LabelFrameInput(self.left_frame, plot_labels, text='Graph Labels')
-
-        plot_btn = ttk.Button(self.left_frame, text='Plot', command=self.plot)
-        plot_btn.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
-
-        self.data_input.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
-        self.plot_labels.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
-        self.graph_options.pack(side=tk.TOP, fill='both',
-                                expand=True, padx=5, pady=5)
-
-        """
-        Middle frame widgets
-        """
-        # Notebook
-        self.notebook = CustomNotebook(self.mid_frame)
-        self.notebook.pack(fill='both', expand=True)
-
-        """
-        Bottom frame widgets
-        """
-
-        # Pack the frames
-        self.left_frame.pack(side=tk.LEFT, fill=tk.Y)
-        self.bottom_frame.pack(side=tk.BOTTOM, fill=tk.X)
-        self.mid_frame.pack(side=tk.LEFT, fill='both', expand=True)
-
-    def get_data(self):
-        "Allows user input CSV and then adjusts the various widgets accordingly"
-        try:
-            file_types = [('CSV files', '.csv')]
-            filename = filedialog.askopenfilename(filetypes=file_types)
-
-            with open(filename, 'r', encoding='utf-8') as data_file:
-                self.base = None
-                self.data = None
-                gc.collect()   # Try to reduce the memory footprint of the loaded data as much as possible
-                data = read_csv(data_file)
-                compress_dataframe(data)
-                self.base = data
-                self.data = self.base.copy(deep=True)
-
+import sys
+import json
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def parse_pairs(pairs):
+    "Turns a list of key=value strings from the command line into a dictionary"
+    values = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f'{pair} is not of the form key=value')
+        values[key.strip()] = value
+    return values
+
+
+def load_specs(filename):
+    """
+    Reads the plot specs of a batch from a JSON or YAML file (YAML needs PyYAML). The file holds a list of specs, or a
+    dictionary with the list under 'plots'. A spec is a dictionary like:
+
+    {"kind": "Barplot", "column": "Name", "output": "names.png", "options": {"categories": 10}, "labels": {"title": "Names"}}
+    """
+    with open(filename, 'r', encoding='utf-8') as spec_file:
+        if os.path.splitext(filename)[1].lower() in ('.yaml', '.yml'):
             try:
-                self.table.destroy()
-                self.table = DataTable(self.bottom_frame, data.head(50).copy(), None)
-                self.table.pack(fill='both', expand=True)
-            except:
-                self.table = DataTable(self.bottom_frame, data.head(50).copy(), None)
-                self.table.pack(fill='both')
-
-            "Add column values to the various dropdown menus"
-            df_columns = list(data.columns)
-            for widget in self.graph_options.inputs.values():
+                import yaml
+            except ImportError:
+                raise SystemExit('Reading YAML specs requires PyYAML, use a JSON file instead.')
+            specs = yaml.safe_load(spec_file)
+        else:
+            specs = json.load(spec_file)
+
+    if isinstance(specs, dict):
+        specs = specs.get('plots', [])
+    return list(specs or [])
+
+
+def render_spec(data, spec, output, source=None):
+    """
+    Renders one plot spec (see load_specs) to the output file. The options are passed on as strings, as the GUI widgets
+    give them, source is passed on to render. Returns None, or a message saying why the plot could not be made.
+    """
+    from plotting import render, save, PlotError
+
+    options = {key: str(value) for key, value in (spec.get('options') or {}).items()}
+    if 'column' in spec:
+        options['column'] = str(spec['column'])
+    labels = dict(spec.get('labels') or {})
+
+    try:
+        figure = render(data, spec['kind'], options, labels, source)
+        save(figure, output, title=str(labels.get('title', '')).strip() or None)
+    except PlotError as error:
+        return f'{error.title}: {error.message}'
+    except KeyError as error:
+        return f'Missing option or unknown column: {error}'
+    return None
+
+
+# Data of a batch worker process, loaded once by init_worker. The specs rendered by a worker share its counts
+worker_data = None
+worker_source = None
+
+def init_worker(pickle_file):
+    "Initializer of the batch worker processes, loads the compressed dataframe that the main process cached"
+    global worker_data, worker_source
+    import matplotlib
+    matplotlib.use('Agg')
+    worker_data, report = pd.read_pickle(pickle_file)
+    worker_source = (pickle_file, None)
+
+
+def render_worker(spec, output):
+    return render_spec(worker_data, spec, output, worker_source)
+
+
+def render_batch(filename, specs, directory='.', workers=None, cache=None):
+    """
+    Renders all plot specs of a csv file across a pool of processes. The csv is read and compressed once, the workers
+    load the compressed dataframe from the DatasetCache pickle instead of parsing the csv again.
+    When no cache is given a temporary one is used. Yields (output, error message or None) as the plots finish.
+    """
+    with tempfile.TemporaryDirectory() as temp_directory:
+        if cache is None:
+            cache = DatasetCache(temp_directory)
+        read_dataset(filename, cache)
+        pickle_file = cache.path(filename)
+
+        outputs = []
+        for number, spec in enumerate(specs):
+            output = spec.get('output') or f"{number:03d}_{str(spec.get('kind', 'plot')).lower()}.png"
+            outputs.append(os.path.join(directory, output))
+        os.makedirs(directory, exist_ok=True)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(pickle_file,)) as pool:
+            futures = {pool.submit(render_worker, spec, output): output for spec, output in zip(specs, outputs)}
+            for future in as_completed(futures):
                 try:
-                    for dictionary in widget:
-                        if dictionary['id'] in {'column', 'bool_column', 'y', 'groupby'}:
-                            if dictionary['id'] == 'groupby':
-                                copy = df_columns.copy()
-                                copy.insert(0, 'None')
-                                dictionary['options'] = copy
-                            else:
-                                dictionary['options'] = df_columns
-                except TypeError:
-                    pass
-
-            "Add filter columns (only categorical or object columns)"
-            temp_list = [dict(kind='combo', label=i, id=i, values=data[i].value_counts(ascending=False).index)
-                         for i in data.select_dtypes(['object', 'category']).columns]
-            temp_list.append(dict(kind='entry', label='Nr. of Rows', id='rows', validate='int'))
-
-
-            self.data_input.inputs = temp_list
-
-            # Scrollable Frames
-            # self.data_input.scroll = True
-            # self.graph_options.scroll = True
-
-            # Enable widgets
-            self.data_input.is_data = True
-            self.graph_options.is_data = True
-            self.plot_labels.is_data = True
-
-            self.data_input.update()
-            self.graph_options.update()
-            self.plot_labels.update()
-
-            messagebox.showinfo(title='Data entry',
-                                message=f'{os.path.basename(filename)} has been read.')
-
-            return os.path.basename(filename)
-
-        except FileNotFoundError:
-            title = 'Data entry'
-            message = 'File was not selected properly. Please select file properly.'
-            messagebox.showerror(title=title, message=message)
+                    yield futures[future], future.result()
+                except Exception as error:
+                    yield futures[future], f'{type(error).__name__}: {error}'
+
+
+def cli(argv=None):
+    """
+    Command line entry point, renders plots without opening a window. For example:
+
+    python main.py render data.csv Barplot bars.png --option column=Gemeente --label title=Gemeenten
+    python main.py batch data.csv specs.json --directory plots --workers 4
+    """
+    parser = argparse.ArgumentParser(description='Renders plots of a csv file without the GUI.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render = commands.add_parser('render', help='render one plot to a file')
+    render.add_argument('csv', help='csv file with the data')
+    render.add_argument('kind', choices=['Barplot', 'Wordcloud', 'Line', 'Icicle'], help='graph type')
+    render.add_argument('output', help='image file to write, the extension gives the format')
+    render.add_argument('--option', action='append', metavar='KEY=VALUE',
+                        help='graph option as in the GUI, e.g. column=Name (can be repeated)')
+    render.add_argument('--label', action='append', metavar='KEY=VALUE',
+                        help='title, xlab, ylab or xkcd (can be repeated)')
+    render.add_argument('--no-cache', action='store_true', help='do not use the dataset cache')
+
+    batch = commands.add_parser('batch', help='render a JSON or YAML file of plot specs in parallel')
+    batch.add_argument('csv', help='csv file with the data')
+    batch.add_argument('specs', help='JSON or YAML file with a list of plot specs')
+    batch.add_argument('--directory', default='.', help='directory for the specs without an absolute output path')
+    batch.add_argument('--workers', type=int, default=None, help='number of processes, default one per cpu')
+    batch.add_argument('--no-cache', action='store_true', help='do not use the dataset cache')
+
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    cache = None if args.no_cache else DatasetCache()
+
+    if args.command == 'batch':
+        failures = 0
+        for output, error in render_batch(args.csv, load_specs(args.specs), args.directory, args.workers, cache):
+            if error is None:
+                print(output)
+            else:
+                failures += 1
+                print(f'{output}: {error}', file=sys.stderr)
+        return 1 if failures else 0
 
-    def plot(self):
+    try:
+        options = parse_pairs(args.option)
+        labels = parse_pairs(args.label)
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
 
-        if self.data is None:
-            title = 'No Data'
-            message = 'There is no data provided to the application.'
-            messagebox.showerror(title=title, message=message)
+    if 'xkcd' in labels:
+        labels['xkcd'] = labels['xkcd'].strip().lower() in ('1', 'true', 'yes')
 
-        else:
-            kind = self.graph_options.graph_type.get()
-            options = self.graph_options.values[kind] if kind in self.graph_options.values else None
-            labels = self.plot_labels.values
-
-            frame = NotebookTab(self.notebook, notebook=self.notebook,
-                                data=self.data, kind=kind, options=options, labels=labels)
-            if frame.is_empty:
-                pass
-            else:
-                title = labels['title'].get()
-                title = title.strip()
-                title = title if title else f'graph {len(self.notebook.tabs()) + 1}'
-                title = f'{kind} - {title}'
-                self.notebook.add(frame, text=title)
-                self.notebook.select(frame)
-
-    def filter_data(self):
-        options = self.data_input.values
-
-        for key, val in options.items():
-            text = val.get().strip()
-            
-            if text:
-                try: 
-                    self.data = self.data[~(self.data[key].astype(str)==text)].reset_index(drop=True)
-                except:
-                    rows = val.get()
-                    length = len(self.data.index)
-                    rows = int(rows) if rows.isdigit() else length
-                    rows = min(rows, length)
-                    self.data = self.data.head(rows)
-                                
-                try:
-                    val.set("")
-                except AttributeError:
-                    val.delete(0, 'end')
-        
-        self.table.update(self.data.head(50))
-        
-    def clear_filter(self):
-        self.data = self.base.copy(deep=True)
-        self.table.update(self.data.head(50).copy())
+    data, report = read_dataset(args.csv, cache)
+    error = render_spec(data, {'kind': args.kind, 'options': options, 'labels': labels}, args.output)
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
 
 
 def main():
+    # The GUI modules are only imported here, so the command line works on a Python without tkinter
+    import tkinter as tk
+    from main_window import MainWindow
+
     root = tk.Tk()
     root.title('GUI Implementation')
     root.state('zoomed')
@@ -251,7 +185,10 @@ def main():
     window_1.pack(expand=True, fill='both')
 
     root.mainloop()
+    window_1.scheduler.shutdown()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
     main()
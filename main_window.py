@@ -0,0 +1,399 @@
+"""
+Main window of the GUI. Only imported by main.main, so the command line of main.py works without Tk.
+"""
+# Tkinter libraries
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from custom_tkinter import LabelFrameInput, CustomNotebook, NotebookTab, DataTable, ProgressDialog
+from custom_tkinter import JobScheduler, StatusBar, PrefixIndex
+from dataset import DatasetCache, FilterHistory, read_dataset, parse_filter
+from plotting import aggregations, layouts
+
+# Other libraries
+import os
+import gc
+import re
+import threading
+import itertools
+
+class MainWindow(ttk.Frame):
+
+    def __init__(self, master, **kw):
+        """ Creates the frame for the main window of the application. It consists of 3 subframes: 
+        The left frame(input), midframe(plots), and the right frame(output)
+        """
+        super().__init__(master, **kw)
+
+        self.left_frame = ttk.Frame(self)
+        self.mid_frame = ttk.Frame(self)
+        self.bottom_frame = ttk.Frame(self, height=205)
+        self.base = None
+        self.view = None
+        self.history = None
+        self.filter_values = {}
+        self.filter_queue = []   # [key, step] of every filter press in order, step is None while it is evaluated
+        self.filter_numbers = itertools.count()
+        self.compress_report = None
+
+        # Heavy work runs on worker threads, the status bar shows when any of it is still busy
+        self.status = StatusBar(self)
+        self.scheduler = JobScheduler(self, on_busy=self.status.set_busy)
+
+        # Datasets that have been read before are loaded from an on disk cache
+        self.cache = DatasetCache()
+
+        """
+        Left frame widgets
+        """
+        # Data entry
+
+        self.data_input = LabelFrameInput(self.left_frame, None, 'data_input',
+                                          command=self.get_data,
+                                          alt_command=[self.filter_data, self.clear_filter, self.undo_filter, self.toggle_filter],
+                                          text='Data entry and preprocessing')
+
+        # Graph Options
+        barplot_widgets = [
+            {'kind': 'optionmenu', 'label': 'Column',
+                'options': ['Not available'], 'id': 'column'},
+            {'kind': 'entry', 'label': 'Nr. of categories', 'id': 'categories', 'validate':'int'},
+            {'kind': 'checkbutton', 'label': 'Other bar', 'id': 'other'}
+        ]
+
+        wordcloud_widgets = [
+            {'kind': 'optionmenu', 'label': 'Column',
+                'options': ['Not available'], 'id': 'column'},
+            {'kind': 'optionmenu', 'label': 'BG color', 'options': [
+                'White', 'Black', 'Transparent'], 'id': 'bg'},
+            {'kind': 'entry', 'label': 'Filter', 'id': 'filter'},
+            {'kind': 'entry', 'label': 'Max words', 'id': 'max_words', 'validate':'int'},
+            {'kind': 'entry', 'label': 'Scale', 'id': 'scale'},
+            {'kind': 'button', 'label': 'Image Mask', 'command': 'file', 'id': 'file_mask', 'text': 'Select File'},
+            {'kind': 'entry', 'label': 'Mask size', 'id': 'mask_size', 'validate':'int'}
+        ]
+
+        icicle_widgets = [
+            {'kind': 'optionmenu', 'label': 'Column',
+                'options': ['Not Available'], 'id': 'column'},
+            {'kind': 'entry', 'label': 'Cutoff', 'id': 'cutoff'},
+            {'kind': 'entry', 'label': 'Width', 'id': 'width'},
+            {'kind': 'entry', 'label': 'Height', 'id': 'height'},
+            {'kind': 'entry', 'label': 'Min Char Width', 'id': 'min_char_width'},
+            {'kind': 'entry', 'label': 'Colours', 'id': 'colours'},
+            {'kind': 'entry', 'label': 'Values', 'id': 'values'},
+            {'kind': 'optionmenu', 'label': 'Bool column',
+                'options': ['Not Available'], 'id': 'bool_column'}
+        ]
+
+        line_widgets = [
+            {'kind': 'optionmenu', 'label': 'Y Axis',
+                'options': ['Not Available'], 'id': 'y'},
+            {'kind': 'optionmenu', 'label': 'Group By',
+                'options': ['Not Available'], 'id': 'groupby'}
+        ]
+        
+        test_widgets = [
+            {'kind': 'optionmenu', 'label': 'Level 1', 'options': ['Not Available'], 'id': 'lv_1'},
+            {'kind': 'optionmenu', 'label': 'Level 2', 'options': ['Not Available'], 'id': 'lv_2'},
+            {'kind': 'optionmenu', 'label': 'Level 3', 'options': ['Not Available'], 'id': 'lv_3'},
+            {'kind': 'optionmenu', 'label': 'Level 4', 'options': ['Not Available'], 'id': 'lv_4'},
+            {'kind': 'optionmenu', 'label': 'Level 5', 'options': ['Not Available'], 'id': 'lv_5'}
+        ]
+        
+        graph_options = {
+            'Barplot': barplot_widgets,
+            'Wordcloud': wordcloud_widgets,
+            'Line': line_widgets,
+            'Icicle': icicle_widgets,
+            # 'Test': test_widgets
+        }
+        
+
+        self.graph_options = LabelFrameInput(self.left_frame, graph_options, text='Graph Options', primary='graph_options')
+
+        # Plot labels
+        plot_labels = [
+            {'kind': 'entry', 'label': 'Title', 'id': 'title'},
+            {'kind': 'entry', 'label': 'Subtitle', 'id': 'subtitle'},
+            {'kind': 'entry', 'label': 'Y Label', 'id': 'ylab'},
+            {'kind': 'entry', 'label': 'X Label', 'id': 'xlab'},
+            {'kind': 'checkbutton', 'label': 'xkcd', 'id': 'xkcd'}
+        ]
+        self.plot_labels = LabelFrameInput(self.left_frame, plot_labels, text='Graph Labels')
+
+        plot_btn = ttk.Button(self.left_frame, text='Plot', command=self.plot)
+        plot_btn.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
+
+        self.data_input.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        self.plot_labels.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
+        self.graph_options.pack(side=tk.TOP, fill='both',
+                                expand=True, padx=5, pady=5)
+
+        """
+        Middle frame widgets
+        """
+        # Notebook
+        self.notebook = CustomNotebook(self.mid_frame)
+        self.notebook.pack(fill='both', expand=True)
+
+        """
+        Bottom frame widgets
+        """
+
+        # Pack the frames
+        self.status.pack(side=tk.BOTTOM, fill=tk.X)
+        self.left_frame.pack(side=tk.LEFT, fill=tk.Y)
+        self.bottom_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.mid_frame.pack(side=tk.LEFT, fill='both', expand=True)
+
+    def get_data(self):
+        """Allows user input CSV and starts reading it in chunks on a worker thread. A dialog shows the progress and
+        allows the reading to be cancelled, the window stays responsive meanwhile."""
+        file_types = [('CSV files', '.csv')]
+        filename = filedialog.askopenfilename(filetypes=file_types)
+
+        if not filename or not os.path.isfile(filename):
+            title = 'Data entry'
+            message = 'File was not selected properly. Please select file properly.'
+            messagebox.showerror(title=title, message=message)
+            return
+
+        name = os.path.basename(filename)
+        dialog = ProgressDialog(self, title='Data entry', text=f'Reading {name}')
+        cancelled = threading.Event()
+        state = {'fraction': 0, 'text': f'Checking cache for {name}'}
+
+        def read():
+            return read_dataset(filename, self.cache, state, cancelled.is_set)
+
+        def progress():
+            if dialog.cancelled:
+                cancelled.set()
+                self.scheduler.cancel('data')
+                dialog.destroy()
+                gc.collect()
+            else:
+                fraction = state['fraction']
+                dialog.set(fraction, text=f"{state['text']} ({fraction:.0%})")
+
+        def done(result):
+            dialog.destroy()
+            if result is not None:
+                data, self.compress_report = result
+                self.load_data(data, name)
+
+        def failed(error):
+            dialog.destroy()
+            messagebox.showerror(title='Data entry', message=f'{name} could not be read.\n{error}')
+
+        self.scheduler.submit('data', read, callback=done, errback=failed, progress=progress)
+
+    def load_data(self, data, name):
+        "Stores the data that has been read and then adjusts the various widgets accordingly"
+        self.cancel_filters()
+        aggregations.clear()   # The counts and word layouts of the previous dataset are never used again
+        layouts.clear()
+
+        # The old data is only let go now, so a cancelled or failed read keeps it usable
+        self.base = None
+        self.view = None
+        self.history = None
+        if hasattr(self, 'table'):
+            self.table.destroy()
+        gc.collect()   # Try to reduce the memory footprint of the loaded data as much as possible
+
+        self.base = data
+        self.history = FilterHistory(self.base)
+        self.view = self.history.view()
+        self.data_input.set_history(self.history.labels())
+
+        self.table = DataTable(self.bottom_frame, self.view, {'scheduler': self.scheduler})
+        self.table.pack(fill='both', expand=True)
+
+        "Add column values to the various dropdown menus"
+        df_columns = list(data.columns)
+        for widget in self.graph_options.inputs.values():
+            try:
+                for dictionary in widget:
+                    if dictionary['id'] in {'column', 'bool_column', 'y', 'groupby'}:
+                        if dictionary['id'] == 'groupby':
+                            copy = df_columns.copy()
+                            copy.insert(0, 'None')
+                            dictionary['options'] = copy
+                        else:
+                            dictionary['options'] = df_columns
+            except TypeError:
+                pass
+
+        "Add filter columns (only categorical or object columns), their values are only counted when first used"
+        self.filter_values = {}
+        temp_list = [dict(kind='combo', label=i, id=i, loader=lambda callback, errback, column=i: self.filter_index(column, callback, errback))
+                     for i in data.select_dtypes(['object', 'category']).columns]
+        temp_list.append(dict(kind='entry', label='Nr. of Rows', id='rows', validate='int'))
+
+
+        self.data_input.inputs = temp_list
+
+        # Scrollable Frames
+        # self.data_input.scroll = True
+        # self.graph_options.scroll = True
+
+        # Enable widgets
+        self.data_input.is_data = True
+        self.graph_options.is_data = True
+        self.plot_labels.is_data = True
+
+        self.data_input.update()
+        self.graph_options.update()
+        self.plot_labels.update()
+
+        self.data_input.filename.set(name)
+        message = f'{name} has been read.'
+        if self.compress_report is not None:
+            before = self.compress_report['bytes_before'].sum() / 2**20
+            after = self.compress_report['bytes_after'].sum() / 2**20
+            message = f'{message}\nIt uses {after:.1f} MB of memory ({before:.1f} MB before compressing).'
+        messagebox.showinfo(title='Data entry', message=message)
+
+    def filter_index(self, column, callback, errback):
+        """Gives callback the PrefixIndex of the values of column (most frequent first). The values are counted on a worker
+        thread the first time and kept until another dataset is loaded. When counting fails errback() is called"""
+        if column in self.filter_values:
+            callback(self.filter_values[column])
+            return
+
+        base = self.base
+
+        def count():
+            return PrefixIndex(base[column].value_counts(ascending=False).index)
+
+        def done(index):
+            if base is self.base:
+                self.filter_values[column] = index
+                callback(index)
+
+        def failed(error):
+            if base is self.base:
+                errback()
+                messagebox.showerror(title='Filter', message=f'The values of {column} could not be counted.\n{error}')
+
+        self.scheduler.submit(('values', column), count, callback=done, errback=failed)
+
+    def plot(self):
+
+        if self.view is None:
+            title = 'No Data'
+            message = 'There is no data provided to the application.'
+            messagebox.showerror(title=title, message=message)
+
+        else:
+            kind = self.graph_options.graph_type.get()
+            options = self.graph_options.get_values(kind)
+            labels = self.plot_labels.get_values()
+
+            frame = NotebookTab(self.notebook, notebook=self.notebook, data=self.view, kind=kind,
+                                options=options, labels=labels, scheduler=self.scheduler)
+
+            title = labels['title']
+            title = title.strip()
+            title = title if title else f'graph {len(self.notebook.tabs()) + 1}'
+            title = f'{kind} - {title}'
+            self.notebook.add(frame, text=title)
+            self.notebook.select(frame)
+
+    def filter_data(self):
+        if self.history is None:
+            return
+
+        options = self.data_input.values
+        filters = []
+        rows = None
+
+        for key, val in options.items():
+            text = val.get().strip()
+            
+            if text:
+                if key == 'rows':
+                    rows = int(text) if text.isdigit() else None
+                else:
+                    try:
+                        filters.append(parse_filter(key, text, self.base[key]))
+                    except re.error as error:
+                        messagebox.showerror(title='Filter', message=f'The filter for {key} is not a valid regex.\n{error}')
+                        return
+                    except ValueError as error:
+                        messagebox.showerror(title='Filter', message=f'The filter for {key} is not valid.\n{error}')
+                        return
+
+        text = '; '.join(f"{key}: {val.get().strip()}" for key, val in options.items() if val.get().strip())
+        if not text:
+            return
+
+        for val in options.values():
+            try:
+                val.set("")
+            except AttributeError:
+                val.delete(0, 'end')
+
+        # Every press gets its own job, the steps are pushed in the order of the presses when they are done
+        key = ('filter', next(self.filter_numbers))
+        self.filter_queue.append([key, None])
+
+        def failed(error):
+            messagebox.showerror(title='Filter', message=f'The filters could not be applied.\n{error}')
+            finish(key, False)
+
+        def done(step):
+            finish(key, step)
+
+        def finish(key, step):
+            for slot in self.filter_queue:
+                if slot[0] == key:
+                    slot[1] = step
+
+            pushed = False
+            while self.filter_queue and self.filter_queue[0][1] is not None:
+                step = self.filter_queue.pop(0)[1]
+                if step is not False:   # False marks a step that failed
+                    self.history.push(step)
+                    pushed = True
+            if pushed:
+                self.show_filtered()
+
+        self.scheduler.submit(key, FilterHistory.make_step, self.base, filters, rows, text,
+                              callback=done, errback=failed)
+
+    def cancel_filters(self):
+        "Forgets the filter steps that are still being evaluated"
+        for key, step in self.filter_queue:
+            self.scheduler.cancel(key)
+        self.filter_queue = []
+
+    def undo_filter(self):
+        if self.history is None:
+            return
+
+        self.cancel_filters()
+        if self.history.undo():
+            self.show_filtered()
+
+    def toggle_filter(self, index):
+        if self.history is None:
+            return
+
+        self.history.toggle(index)
+        self.show_filtered()
+        
+    def clear_filter(self):
+        if self.history is None:
+            return
+
+        self.cancel_filters()
+        self.history.clear()
+        self.show_filtered()
+
+    def show_filtered(self):
+        "Updates the view, table and filter history list after the filter history has changed"
+        self.view = self.history.view()
+        self.table.update(self.view)
+        self.data_input.set_history(self.history.labels())
@@ -0,0 +1,877 @@
+"""
+Headless plotting engine. Every plot type is built from a DataFrame and a dictionary of plain options (strings, as the
+GUI widgets give them, or numbers), without Tk. Plots can therefore be made on worker threads of the GUI, or on servers
+without a display using the Agg backend.
+"""
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from matplotlib.collections import PatchCollection
+import wordcloud as wc
+
+import pandas as pd
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import os
+import threading
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from copy import copy
+from ast import literal_eval
+
+class PlotError(Exception):
+    "Raised by the plot functions when the chosen options can not be plotted. Holds a title and message for a messagebox"
+
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+
+default_labels = {'title': '', 'xlab': '', 'ylab': '', 'xkcd': 0}
+
+_render_lock = threading.Lock()
+
+def render(data, kind, options, labels=None, source=None):
+    """
+    Builds the plot of the given kind ('Barplot', 'Wordcloud', 'Line' or 'Icicle') from data.
+    labels may leave out any of the keys in default_labels. source is a hashable identifying data (dataset version and
+    filter state), the counts of the plots are kept in the aggregations cache under it. Without a source nothing is cached.
+
+    Returns a matplotlib Figure, with the title of labels set. Wordcloud figures keep the WordCloud object in their
+    wordcloud attribute. For 'Icicle' an IcicleLayout is returned, see icicle_figure to draw it in a Figure.
+    """
+    labels = {**default_labels, **(labels or {})}
+
+    plot_types = {
+        'Barplot': barplot,
+        'Wordcloud': wordcloud,
+        'Line': line,
+        'Icicle': icicle
+    }
+    if kind not in plot_types:
+        raise PlotError(title='Graph Type', message=f'{kind} is not a known graph type.')
+
+    # plt.xkcd changes the global rcParams, which every figure reads while it is built, so figures are built one at a
+    # time. Otherwise overlapping renders restore each other's style and figures get xkcd styling halfway.
+    with _render_lock:
+        if labels['xkcd']:
+            with plt.xkcd():
+                figure = plot_types[kind](data=data, options=options, labels=labels, source=source)
+        else:
+            figure = plot_types[kind](data=data, options=options, labels=labels, source=source)
+
+    if isinstance(figure, Figure):
+        title = str(labels['title']).strip()
+        if title:
+            figure.suptitle(title)
+        figure.set_tight_layout(True)
+
+    return figure
+
+class AggregationCache:
+    """
+    Least recently used cache of the counts the plots are made of, shared by all plots so several tabs on the same column
+    and filter count it only once. The size of the cache is bounded by the memory used by the cached counts.
+    Keys start with the source given to render (dataset version and filter state). The cache can be used from threads.
+    """
+
+    def __init__(self, max_bytes=256*2**20, sizeof=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof if sizeof is not None else lambda value: int(value.memory_usage(index=True, deep=True))
+        self.entries = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        "Returns the cached value of key, or computes, stores and returns it. Nothing is cached when key is None"
+        if key is None:
+            return compute()
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+
+        value = compute()
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return value
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (value, size)
+                self.total += size
+            while self.total > self.max_bytes:
+                old_value, old_size = self.entries.popitem(last=False)[1]
+                self.total -= old_size
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total = 0
+
+aggregations = AggregationCache()
+
+# Word layouts of wordclouds, which take much longer to compute than the counts they are made of
+layouts = AggregationCache(max_bytes=512*2**20,
+                           sizeof=lambda cloud: 1024 * len(cloud.layout_) + getattr(cloud.mask, 'nbytes', 0))
+
+def _codes(series):
+    "Integer codes (-1 for missing values) and the values they stand for. Categoricals already have them"
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), pd.Index(np.asarray(series.cat.categories))
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+def _sorted(counts):
+    try:
+        return counts.sort_index()
+    except TypeError:   # Values that can not be compared keep the order they were found in
+        return counts
+
+def value_counts(data, column, source=None):
+    "Number of rows of every value of column, sorted by value. Missing values and values without rows are left out"
+    def compute():
+        codes, uniques = _codes(data[column])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        present = np.flatnonzero(counts)
+        return _sorted(pd.Series(counts[present], index=uniques[present], name=column))
+
+    key = None if source is None else (source, 'value_counts', column)
+    return aggregations.get(key, compute)
+
+def top_counts(data, column, number, source=None):
+    """
+    The number most common values of column with their number of rows, most common first. Ties keep the order of the
+    values. The number of rows of all other (not missing) values is in attrs['other'] of the result.
+
+    Only the counts of the codes are made (np.bincount), the top is picked with np.argpartition, so this takes linear time
+    and little memory even when the column has millions of distinct values.
+    """
+    def compute():
+        codes, uniques = _codes(data[column])
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+        top = np.flatnonzero(counts)
+        if len(top) > number:
+            top = np.sort(np.argpartition(-counts, number - 1)[:number])
+        top = top[np.argsort(-counts[top], kind='stable')]
+
+        result = pd.Series(counts[top], index=uniques[top], name=column)
+        result.attrs['other'] = int(counts.sum() - result.sum())
+        return result
+
+    key = None if source is None else (source, 'top_counts', column, number)
+    return aggregations.get(key, compute)
+
+def group_counts(data, by, column, source=None):
+    """
+    Number of rows of every value of column within every group of by, as a Series with a (group, value) MultiIndex
+    sorted by group and value. Missing values and empty combinations are left out.
+    """
+    def compute():
+        group_codes, groups = _codes(data[by])
+        value_codes, values = _codes(data[column])
+        keep = (group_codes >= 0) & (value_codes >= 0)
+        combined = group_codes[keep].astype(np.int64) * len(values) + value_codes[keep]
+
+        if len(groups) * len(values) <= 4 * len(combined) + 1024:
+            counts = np.bincount(combined, minlength=len(groups) * len(values))
+            combined = np.flatnonzero(counts)
+            counts = counts[combined]
+        else:   # Too many combinations for a dense table, count only the ones that occur
+            combined, counts = np.unique(combined, return_counts=True)
+
+        index = pd.MultiIndex.from_arrays([groups[combined // len(values)], values[combined % len(values)]],
+                                          names=[by, column])
+        return _sorted(pd.Series(counts, index=index, name=column))
+
+    key = None if source is None else (source, 'group_counts', by, column)
+    return aggregations.get(key, compute)
+
+# Formats an IcicleLayout is saved to with icicle_figure instead of icicle_image
+vector_extensions = ('.svg', '.svgz', '.pdf', '.eps', '.ps')
+
+def save(figure, filename, title=None, **kwargs):
+    """
+    Saves a rendered figure. Wordclouds are saved at full resolution with WordCloud.to_file, except as jpeg.
+    An IcicleLayout is drawn with icicle_figure for vector formats and with icicle_image otherwise, title and kwargs
+    (items, fills) are passed on to those.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    cloud = getattr(figure, 'wordcloud', None)
+
+    if isinstance(figure, IcicleLayout):
+        if extension in vector_extensions:
+            icicle_figure(figure, title=title, **kwargs).savefig(filename)
+        else:
+            icicle_image(figure, title=title, **kwargs).save(filename)
+    elif cloud is not None and extension not in ('.jpg', '.jpeg'):
+        cloud.to_file(filename)
+    else:
+        figure.savefig(filename)
+
+def _option(options, key, default=''):
+    "Option as a stripped string, so options from the GUI (strings) and from files (numbers) are handled alike"
+    value = options.get(key, default)
+    return '' if value is None else str(value).strip()
+
+# Preprocessed wordcloud masks, the same few (large) images are used again and again
+masks = AggregationCache(max_bytes=256*2**20, sizeof=lambda mask: 2 * mask[0].nbytes)
+
+def mask_key(filename, size=None):
+    "Key of a mask file in the masks cache: path, modification time and size. Raises OSError when it does not exist"
+    return (os.path.abspath(filename), os.stat(filename).st_mtime, size)
+
+def load_mask(filename, size=None):
+    """
+    The mask array of an image file, with black (0) pixels made white, and the ImageColorGenerator colouring words by
+    it. When size is given, images larger than size pixels on either side are downsampled to fit first.
+    The results are cached by path and modification time, and are shared: the array is read only.
+    """
+    def compute():
+        with Image.open(filename) as image:
+            if size and max(image.size) > size:
+                image = image.copy()
+                image.thumbnail((size, size), Image.LANCZOS)
+            mask = np.array(image)
+
+        mask[mask==0] = 255
+        colours = wc.ImageColorGenerator(mask)
+        mask.setflags(write=False)
+        return mask, colours
+
+    return masks.get(mask_key(filename, size), compute)
+
+def word_frequencies(data, column, pattern='', source=None):
+    "Counts of the values of column that consist of words, leaving out the values matching the regex pattern"
+    def compute():
+        names = value_counts(data, column, source)
+        names = names[names.index.str.match(r"^[a-zA-Z ']+$", na=False)]
+        if pattern:
+            names = names[~(names.index.str.match(pattern))]
+        return names
+
+    key = None if source is None else (source, 'word_frequencies', column, pattern)
+    return aggregations.get(key, compute)
+
+def wordcloud(data, options, labels, source=None):
+    """
+    Wordcloud of the values of a column. The word layout is cached per (source, column, filter, mask, size), changing
+    only the background reuses it. max_words, scale and mask_size (the largest side of the mask) trade quality for speed.
+    With the preview option a quick layout of at most 100 words at half the size is made instead, the WordCloud of the
+    figure then has preview set.
+    """
+    figure = Figure(figsize=(7, 5))
+    ax = figure.add_subplot()
+    groupby_column = options['column']
+
+    # Data manipulation
+    try:
+        filt = _option(options, 'filter')
+        names = word_frequencies(data, groupby_column, filt, source)
+
+        bg = _option(options, 'bg')
+        bg = 'white' if bg == '' else bg.lower()
+        if bg == 'transparent':
+            bg = None
+
+        mask = _option(options, 'file_mask')
+        max_words = _option(options, 'max_words')
+        max_words = int(max_words) if max_words.isdigit() and int(max_words) > 0 else (500 if mask else 200)
+        try:
+            scale = float(_option(options, 'scale') or 3)
+        except ValueError:
+            scale = 3
+        scale = scale if scale > 0 else 3
+
+        mask_size = _option(options, 'mask_size')
+        mask_size = int(mask_size) if mask_size.isdigit() and int(mask_size) > 0 else None
+
+        width, height = 700, 500
+        preview = _option(options, 'preview', '0') not in ('', '0', 'False', 'false')
+        if preview:
+            width, height = width // 2, height // 2
+            max_words = min(max_words, 100)
+            mask_size = min(mask_size or width, width)
+            scale = 1
+
+        try:
+            mask_file = mask_key(mask, mask_size) if mask else None
+        except OSError:
+            raise PlotError(title='Image Mask', message=f'The image mask {mask} could not be opened.')
+
+        def compute():
+            frequencies = names.nlargest(max_words).to_dict()
+            if mask:
+                mask_image, colours = load_mask(mask, mask_size)
+                cloud = wc.WordCloud(background_color=bg, scale=scale, mask=mask_image,
+                                     max_words=max_words, max_font_size=50,
+                                     mode='RGBA').generate_from_frequencies(frequencies)
+                return cloud.recolor(color_func=colours)
+
+            return wc.WordCloud(background_color=bg, width=width, height=height, scale=scale, max_words=max_words,
+                                mode='RGBA').generate_from_frequencies(frequencies)
+
+        key = None if source is None else (source, groupby_column, filt, mask_file, width, max_words, scale)
+        cloud = copy(layouts.get(key, compute))   # The cached layout is shared, only the copy gets the background
+        cloud.background_color = bg
+        cloud.preview = preview
+
+        ax.imshow(cloud, interpolation='bilinear')
+        ax.set_axis_off()
+        figure.wordcloud = cloud
+        return figure
+
+    except AttributeError:
+        message = 'The chosen column does not consist of strings.'
+        raise PlotError(title='Column Choice', message=message)
+    except ValueError:
+        message = 'The chosen column does not consist of words.'
+        raise PlotError(title='Column Choice', message=message)
+
+def barplot(data, options, labels, source=None):
+    figure = Figure(figsize=(7, 5))
+
+    groupby_column = options['column']
+    number = _option(options, 'categories')
+    number = int(number) if number.isdigit() else 10
+
+    # Data Manipulation
+    names = top_counts(data, groupby_column, max(number, 1), source)
+    colours = ['C0'] * len(names)
+
+    if _option(options, 'other', '0') not in ('', '0', 'False', 'false') and names.attrs['other'] > 0:
+        other = pd.Series([names.attrs['other']], index=['Other'])
+        names = pd.concat([names.set_axis(names.index.astype(object)), other])
+        colours.append('grey')
+
+    # Data Visualisation
+    ax = figure.add_subplot()
+    names.plot(kind='bar', ax=ax, color=colours)
+
+    xlab = labels['xlab']
+    ylab = labels['ylab']
+
+    if xlab:
+        ax.set_xlabel(xlab)
+    if ylab:
+        ax.set_ylabel(ylab)
+
+    return figure
+
+def line(data, options, labels, source=None):
+    "Line plot of the value counts of column y, one line per group when groupby is not 'None'"
+    y_ax = options['y']
+    groupby = _option(options, 'groupby', 'None')
+    # Data manipulation
+    figure = Figure()
+    ax = figure.add_subplot()
+
+    if groupby == 'None':
+        used_data = value_counts(data, y_ax, source)
+        ax.plot(used_data.index, used_data.values, marker='o')
+    
+    else:
+        counts = group_counts(data, groupby, y_ax, source)
+        for label, used_data in counts.groupby(level=0, sort=False):
+            used_data = used_data.droplevel(0)
+            ax.plot(used_data.index, used_data.values, label=label, marker='o', picker=1)
+
+        ax.legend()
+
+    return figure
+
+def icicle(data, options, labels, source=None):
+    return IcicleLayout(data, options)
+
+def icicle_figure(layout, title=None, dpi=100, items=None, fills=None):
+    """
+    Draws an IcicleLayout in a matplotlib Figure of the same size as the canvas it was made for, all rectangles at once
+    as a PatchCollection. Suited for vector formats (svg, pdf); icicle_image is faster for bitmaps.
+    items are the items to draw (default layout.items, see IcicleLayout.render), fills maps item numbers to other fill
+    colours, e.g. of selected rectangles.
+    """
+    items = layout.items if items is None else items
+    fills = fills or {}
+    figure = Figure(figsize=(layout.width/dpi, layout.height/dpi), dpi=dpi)
+    ax = figure.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, layout.width)
+    ax.set_ylim(layout.height, 0)
+    ax.set_axis_off()
+
+    rectangles = []
+    colours = []
+    alignment = {'w': 'left', 'e': 'right'}
+    for number, (kind, coordinates, options) in enumerate(items):
+        fill = fills.get(number, options.get('fill', 'black'))
+        if kind == 'rectangle':
+            x1, y1, x2, y2 = coordinates
+            rectangles.append(Rectangle((x1, y1), x2-x1, y2-y1))
+            colours.append(fill)
+        else:
+            ax.text(*coordinates, options['text'], ha=alignment.get(options.get('anchor'), 'center'), va='center',
+                    color=fill, fontsize=8, clip_on=True)
+
+    ax.add_collection(PatchCollection(rectangles, facecolors=colours, edgecolors='black', linewidths=0.5, zorder=0))
+
+    if title is not None:
+        ax.text(5, 5, title, ha='left', va='top', fontsize=10)
+
+    return figure
+
+def icicle_image(layout, title=None, items=None, fills=None):
+    """
+    Draws an IcicleLayout into a PIL image of the size of the canvas it was made for, in one pass over the items without
+    any canvas items or matplotlib artists. Arguments as for icicle_figure.
+    """
+    items = layout.items if items is None else items
+    fills = fills or {}
+    image = Image.new('RGB', (int(layout.width), int(layout.height)), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+
+    for number, (kind, coordinates, options) in enumerate(items):
+        fill = fills.get(number, options.get('fill', 'black'))
+        if kind == 'rectangle':
+            x1, y1, x2, y2 = coordinates
+            draw.rectangle((min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)), fill=fill, outline='black')
+        else:
+            x, y = coordinates
+            left, top, right, bottom = draw.textbbox((0, 0), options['text'], font=font)
+            if options.get('anchor') == 'e':
+                x -= right
+            elif options.get('anchor') != 'w':
+                x -= right/2
+            draw.text((x, y - (top + bottom)/2), options['text'], fill=fill, font=font)
+
+    if title is not None:
+        draw.text((5, 5), title, fill='black', font=font)
+
+    return image
+
+class RectangleIndex:
+    """
+    Grid index of the rectangles of an icicle (the coordinates in a memorydict) for hit testing. At any point at most one
+    rectangle of an icicle is found, so the rectangles covering a pixel row do not overlap: every row keeps them sorted by
+    their left side and a point is found by a binary search in its row.
+
+    The subtree of a rectangle is a range of the same rows: the rectangles within its height, right of it.
+    """
+
+    def __init__(self, rectangles, height):
+        self.rectangles = list(rectangles)
+        self.height = int(np.ceil(height))
+        rows = [[] for _ in range(self.height + 1)]
+
+        for number, (x1, y1, x2, y2) in enumerate(self.rectangles):
+            for row in range(self._row(min(y1, y2)), self._row(max(y1, y2)) + 1):
+                rows[row].append((x1, number))
+
+        self.lefts = []
+        self.numbers = []
+        for row in rows:
+            row.sort()
+            self.lefts.append([left for left, number in row])
+            self.numbers.append([number for left, number in row])
+
+    def _row(self, y):
+        return min(max(int(y), 0), self.height)
+
+    def find(self, x, y):
+        "Number of the rectangle containing the point, or None"
+        row = self._row(y)
+        position = bisect_right(self.lefts[row], x)
+        # rectangles meeting inside a pixel row share it, so look further left while the point is not inside
+        for number in reversed(self.numbers[row][:position]):
+            x1, y1, x2, y2 = self.rectangles[number]
+            if x1 < x < x2 and y1 < y < y2:
+                return number
+        return None
+
+    def subtree(self, number):
+        "Numbers of the rectangle and all rectangles below it in the icicle, in no particular order"
+        x1, y1, x2, y2 = self.rectangles[number]
+        # the rectangles are 1 pixel smaller than their node on every side, rectangles under 2 pixels high are flipped
+        top, bottom = y1 - 1, y2 + 1
+        found = {number}
+        for row in range(self._row(top), self._row(bottom) + 1):
+            start = bisect_left(self.lefts[row], x1)
+            for other in self.numbers[row][start:]:
+                other_y1, other_y2 = self.rectangles[other][1], self.rectangles[other][3]
+                if min(other_y1, other_y2) >= top and max(other_y1, other_y2) <= bottom:
+                    found.add(other)
+        return found
+
+class IcicleLayout:
+
+    min_height = 1   # Pixels, lower rectangles are merged with their neighbours
+    label_height = 10   # Pixels, lower rectangles get no label
+
+    def __init__(self, data, inputs):
+        # retype strings to integers and tuples:
+        options = inputs.copy()
+        Column = options['column']
+        try:
+            
+            Height = _option(options, 'height')
+            Width = _option(options, 'width')
+            Height = int(Height) if Height.isdigit() else 700
+            Width = int(Width) if Width.isdigit() else 700
+
+            cutoff = _option(options, 'cutoff')
+            min_char_width = _option(options, 'min_char_width')
+            cutoff = int(cutoff) if cutoff.isdigit() else 1
+            min_char_width = int(min_char_width) if min_char_width.isdigit() else 1
+        
+        except ValueError:
+            title = 'Incorrect Input'
+            message = 'cutoff, Height, Width or min_char_width was not coercable to int'
+            raise PlotError(title=title, message=message)
+        
+        # decode strings representing tuples:
+        bool_clrs_str = _option(options, 'colours')
+        try:
+            bool_clrs = literal_eval(f'[{bool_clrs_str}]')
+        except (ValueError, SyntaxError):
+            raise PlotError(title='Incorrect Input', message='Colours should be RGB tuples: (###,###,###),(###,###,###)')
+        options['bool_clrs'] = bool_clrs
+        
+        # decode strings representing names
+        bool_val_str = _option(options, 'values')
+        bool_vals = bool_val_str.split(',') if bool_val_str else []
+        
+        options['bool_vals'] = bool_vals
+        options['bool_clmn'] = _option(options, 'bool_column')
+
+        # without colours and values the rectangles get the plain colour
+        colour_mode = 'bool_blend' if bool_clrs and bool_vals and options['bool_clmn'] in data else 'plain'
+
+        x = 0
+        y = 0
+        """
+        Does all the work for the name icicle plot except the traversal:
+        Sorts the names, determines how high 1 name is and how wide 1 character is and builds the prefix tree.
+        Nothing is drawn here: the rectangles and texts are stored in self.items, which IciclePlot draws on a canvas.
+        This keeps the layout free of Tk, so it can be computed on a worker thread.
+
+        Arguments:
+        self: parent Window1 object
+        data: a list of names or pandas DataFrame.
+            If a DataFrame is given, name_clmn is used to decide what column to use for names.
+        width: width of desired canvas
+        height: height of desired canvas
+        x,y: coordinates of starting position. Useful for recursion and to make labels on the side
+        cutoff: determines the minimum number of names required to get a rect to actually display, minimum 1
+        min_char_width: determines a minimum width per character on the final graph, for if some names are extremely long
+        Column selects the column to use for plotting if the data is a DataFrame, can be int or string
+
+        Output:
+        items: a list of ('rectangle' or 'text', coordinates, canvas item options) in drawing order
+        memorydict: a dictionary containing the location and selectedness of all rectangles
+            example entry: 'Menno' : [(200,250,300,350), False, (255,0,255), 'no']
+            representing the square representing the names starting with Menno,
+            which spans from (200,250) to (300,350), which is not selected
+            All rectangles start out not selected
+            3rd entry is the colour of the rectangle
+            4th entry is the text in this rectangle
+        """
+
+        # get the name column from the dataframe if needed, sort stuff
+        if type(data) == pd.core.frame.DataFrame:
+            mask = data[Column].notnull().values
+            self.data = data.loc[mask]
+            self.name_list = [str(x) for x in self.data[Column].values]
+        else:
+            self.name_list = [str(x) for x in data]
+            self.data = pd.DataFrame({Column: self.name_list})
+
+        # sorting names and cleaning input, the rows of data are kept in the same order as the names
+        order = np.argsort(np.array(self.name_list, dtype=object), kind='stable')
+        order = order[[self.name_list[i] not in ('-1', '') for i in order]]
+        names = [self.name_list[i] for i in order]
+        self.data = self.data.iloc[order]
+
+        if not names:
+            raise PlotError(title='Column Choice', message='The chosen column has no names to plot.')
+
+        # canvas size, the items to be drawn on the canvas are made by render
+        self.width = Width
+        self.height = Height
+
+        # create an appropriate colour function:
+        self.clr_func = self.clr_func_definer(
+            self.data, 'b', mode=colour_mode, **options)
+
+        def black_or_white(clr):
+            """takes an input hexcode, returns the hex code for what will be more visible: black or white"""
+            nrs = "0123456789abcdef"
+            r = nrs.index(clr[1])*16+nrs.index(clr[2])
+            g = nrs.index(clr[3])*16+nrs.index(clr[4])
+            b = nrs.index(clr[5])*16+nrs.index(clr[6])
+
+            if r+g+b < 381:  # average value under 127
+                return("#ffffff")
+            else:
+                return("#000000")
+
+        self.text_clr_func = black_or_white
+
+        # determine height and width
+        lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+        height_per_name = Height/len(names)
+        width_per_char = max(Width/lengths.max(), min_char_width)
+
+        self.names = names
+        self.tree = self.prefix_tree(names, lengths)
+        self.width_per_char = width_per_char
+        self.height_per_name = height_per_name
+        self.cutoff = cutoff
+        self.items, self.memorydict = self.render()
+
+    def render(self, top=0, bottom=None):
+        """
+        Items and memorydict of the part top:bottom (in canvas coordinates of the whole plot) of the icicle, stretched
+        to the height of the canvas. Only the level of detail that can be seen is laid out, see NameIciclePlot, so
+        zooming in on a smaller part shows more of it.
+        """
+        bottom = self.height if bottom is None else bottom
+        scale = self.height/(bottom - top)
+        return self.NameIciclePlot(self.names, self.tree, self.width_per_char, self.height_per_name*scale,
+                                   0, -top*scale, self.width, self.cutoff)
+
+    @staticmethod
+    def common_prefixes(names, lengths, block=65536, max_points=2**24):
+        """
+        Length of the common prefix of every name with the name before it (0 for the first name).
+        The names are compared a block at a time as arrays of unicode code points, so no Python loop runs over characters.
+        A block is as wide as its longest name, so blocks with long names get fewer rows, at most max_points code points
+        """
+        lcp = np.zeros(len(names), dtype=np.int64)
+        start = 1
+        while start < len(names):
+            longest = max(1, int(lengths[start-1:start+block].max()))
+            rows = max(1, min(block, max_points // longest))
+            chunk = np.array(names[start-1:start+rows])
+            width = chunk.itemsize // 4
+            points = chunk.view(np.uint32).reshape(len(chunk), width)
+            differ = points[1:] != points[:-1]
+            found = differ.any(axis=1)
+            prefix = np.where(found, differ.argmax(axis=1), width)
+            end = start + len(prefix)
+            lcp[start:end] = np.minimum(prefix, np.minimum(lengths[start-1:end-1], lengths[start:end]))
+            start = end
+        return lcp
+
+    def prefix_tree(self, names, lengths):
+        """
+        Compressed prefix trie of the sorted names, built in one pass over their common prefixes (the lcp interval tree).
+        Every node is [prefix length, first, end, children]: the names[first:end] share their first prefix length
+        characters and no more. A name is a leaf with its own length as prefix length. Returns the root, of length 0
+        """
+        lcp = self.common_prefixes(names, lengths)
+
+        stack = [[0, 0, len(names), []]]
+        pending = [int(lengths[0]), 0, 1, []]
+        for i in range(1, len(names)):
+            common = int(lcp[i])
+            while stack[-1][0] > common:
+                node = stack.pop()
+                node[2] = i
+                node[3].append(pending)
+                pending = node
+            if stack[-1][0] == common:
+                stack[-1][3].append(pending)
+            else:
+                stack.append([common, pending[1], None, [pending]])
+            pending = [int(lengths[i]), i, i+1, []]
+
+        while len(stack) > 1:
+            node = stack.pop()
+            node[2] = len(names)
+            node[3].append(pending)
+            pending = node
+        stack[0][3].append(pending)
+        return stack[0]
+
+    def NameIciclePlot(self, names, tree, width_per_char, height_per_name, x, y,
+                       outline, cutoff, *args, **kwargs):
+        """Plots the icicle graph from a single traversal of the prefix tree of the names, see prefix_tree.
+        Every node is a rectangle of its names, starting where its parent ended and as wide as the characters it adds.
+        Names that end in a node (full overlap) are counted at the right side, the longer names are drawn above them.
+        outline is the width, the point where names must have ended
+
+        Level of detail: nodes outside the canvas height are not visited. Neighbouring nodes lower than min_height pixels
+        are merged into one unlabeled rectangle (left out when that is still too low), and labels are only added to
+        rectangles at least label_height pixels high. The number of items is thus bounded by the canvas, not the data.
+        Returns the items and the memorydict, whose entries end with the numbers of their rectangle and label in items
+        (None without label)"""
+        items = []
+        memorydict = {}
+
+        def place(children, depth, x, y):
+            "Stack entries of the children, stacked from y down, in reverse so the first is handled first"
+            placed = []
+            run = None   # [first, end, y, characters] of neighbouring nodes that are too low to draw on their own
+            for child in children:
+                height = (child[2] - child[1])*height_per_name
+                if height >= self.min_height:
+                    if run is not None:
+                        placed.append(('merged', run, depth, x))
+                        run = None
+                    placed.append((child, depth, x, y))
+                elif run is None:
+                    run = [child[1], child[2], y, child[0] - depth]
+                else:
+                    run[1] = child[2]
+                    run[3] = min(run[3], child[0] - depth)
+                y += height
+            if run is not None:
+                placed.append(('merged', run, depth, x))
+            return reversed(placed)
+
+        # entries are (node, characters of the parent, x, y), a text to add after the children of a node,
+        # or a run of merged nodes
+        stack = list(place(tree[3], 0, x, y))
+        while stack:
+            entry = stack.pop()
+            if entry[0] == 'text':
+                items.append(entry[1])
+                continue
+
+            if entry[0] == 'merged':
+                (first, end, y, characters), depth, x = entry[1:]
+                end_y = y+((end - first)*height_per_name)
+                if end - first >= cutoff and end_y - y >= self.min_height and end_y >= 0 and y <= self.height:
+                    rect_clr = self.clr_func(first, end)
+                    items.append(('rectangle', (x+1, y, x+(width_per_char*characters)-1, end_y), dict(fill=rect_clr)))
+                continue
+
+            (length, first, end, children), depth, x, y = entry
+            nrnames = end - first
+            end_x = x+(width_per_char*(length - depth))
+            end_y = y+(nrnames*height_per_name)
+            if nrnames < cutoff or end_y < 0 or y > self.height:
+                # any displaying will only happen if the cutoff is reached and the node is on the canvas
+                continue
+
+            rect_clr = self.clr_func(first, end)
+            text_clr = self.text_clr_func(rect_clr)
+            item_numbers = (len(items), None)
+            items.append(('rectangle', (x+1, y+1, end_x-1, end_y-1), dict(fill=rect_clr)))
+            display_text = names[first][depth:length]
+            if end_y - y >= self.label_height:
+                item_numbers = (item_numbers[0], len(items))
+                items.append(('text', (x + 5, (y + end_y)/2), dict(text=display_text, anchor='w', fill=text_clr)))
+            memorydict[names[first][:length]] = [
+                (x+1, y+1, end_x-1, end_y-1), False, rect_clr, display_text, item_numbers]
+
+            # names equal to the prefix come first, the longer names are children drawn from the top
+            full_overlap = 1 if not children else 0
+            while full_overlap < len(children) and not children[full_overlap][3] \
+                    and children[full_overlap][0] == length:
+                full_overlap += 1
+
+            mid_y = y + (nrnames - full_overlap)*height_per_name
+            if full_overlap >= cutoff and end_y - mid_y >= self.label_height:
+                disp_text = names[first] + ' : ' + str(nrnames)
+                stack.append(('text', ('text', (outline, (mid_y + end_y)/2), dict(text=disp_text, anchor='e'))))
+
+            stack.extend(place(children[full_overlap:], length, end_x, y))
+
+        return items, memorydict
+
+    def clr_func_definer(self, dat, main_clr : str, mode : str, 
+                     bool_clrs : list = None, bool_clmn : str = None, bool_vals : list = None, **kwargs):
+      """Returns a colour function used to colour in a graph
+
+      Arguments:
+      dat: the dataframe that will be used for the graph, its rows in the order of the sorted names
+      main_clr: the main colour used. 'r' for red, 'g' for green or 'b' for blue.
+      mode: what mode is used to turn the data into a colour. 
+          Supported modes: 
+          bool: a set of values and colorrs is given. 
+              For each rect, the colour is that of the value that occurs most in this rect
+          bool_blend: a set of values and colours is given
+              For each rect, the colour is the weighted average of colours given, weights being how often each name occurs
+      bool_clrs: a list of rgb tuples for colours for each value, only required in bool mode
+      bool_clmn: the column in the dataframe containing the values worked on, only required in bool mode
+      bool_vals: the values to check for, only required in bool mode
+
+      The colour function takes the rows first:end of dat (a rectangle). In bool modes the column is encoded once into
+      codes of bool_vals, with cumulative counts per value, so the counts of a rectangle are a difference of two rows.
+      """
+
+      convert_main_clr_dict = {'r' : 0, 'g': 1,'b' : 2}
+      main_index = convert_main_clr_dict[main_clr]
+
+      if mode == 'bool' or mode == 'bool_blend': #creates a bool or bool_blend mode function
+          # catching invalid input for bool or bool_blend modes:
+          for item in [bool_clrs, bool_clmn, bool_vals]:
+              if item == None:
+                  raise TypeError('bool_clrs, bool_clmn or bool_vals missing while in bool mode')
+          if len(bool_clrs) != len(bool_vals):
+              raise Exception("""bool_clrs and bool_vals were not of equal length. 
+                              clr_func_definer requires an identical number of colours and values in bool mode.""")
+
+          # codes of the values (-1 for other values) and their cumulative counts over the rows:
+          values = list(dict.fromkeys(bool_vals))
+          codes = pd.Categorical(dat[bool_clmn], categories=values).codes
+          cumulative = np.zeros((len(codes) + 1, len(values)), dtype=np.int64)
+          for code in range(len(values)):
+              np.cumsum(codes == code, out=cumulative[1:, code])
+          # the colour of every value, the first one given when a value is given twice
+          clrs = np.array([bool_clrs[bool_vals.index(val)] for val in values], dtype=np.int64).reshape(-1, 3)
+          # how often every value is counted in the blend, values given twice count twice
+          repeats = np.array([bool_vals.count(val) for val in values], dtype=np.int64)
+
+          if mode == 'bool':
+              # actual defining of bool function:
+              def clr_func(first, end, none_clr = (127,127,127), **kwargs):
+                  f"""Colour function finding the most common value of {bool_vals} in rows first:end in column {bool_clmn}
+                  and returning the value in {bool_clrs} of the same index.
+                  Arguments:
+                  first, end: the rows of the rectangle
+                  except_clr: the colour to be output when none of the values in {bool_vals} are encountered"""
+                  counts = cumulative[end] - cumulative[first]
+                  # determining the most common occurence, prefering values given first:
+                  if len(counts) == 0 or counts.max() == 0:
+                      return(self._from_rgb(none_clr))
+                  return(self._from_rgb(tuple(int(c) for c in clrs[counts.argmax()])))
+          elif mode == 'bool_blend':
+              # actual definition of bool_blend function:
+              def clr_func(first, end, none_clr = (127,127,127), **kwargs):
+                  f"""
+                  Colour function giving a weighted average of the colours in {bool_clrs}, 
+                  the weights being the number of occurences of {bool_vals} with the same index in {bool_clmn}
+                  Arguments:
+                  first, end: the rows of the rectangle
+                  except_clr: the colour to be output when none of the values in {bool_vals} are encountered
+                  """
+                  counts = (cumulative[end] - cumulative[first]) * repeats
+                  counter = int(counts.sum())
+                  if counter > 0:
+                      # zeroDivision failsafe: if no values encountered, return none_clr
+                      r, g, b = (int(int(total)/counter) for total in counts @ clrs)
+                      return(self._from_rgb((r,g,b)))
+                  else:
+                      return(self._from_rgb(none_clr))
+
+          return(clr_func)
+
+
+      # default colour function only giving 255 for main_clr
+      def clr_func(*args, **kwargs):
+          clr = [0,0,0]
+          clr[main_index] = 255
+          clr = tuple(clr)
+          return(self._from_rgb(clr))
+      return(clr_func)
+
+    def _from_rgb(self, rgb):
+        """translates an rgb tuple of int to a tkinter friendly color code
+        """
+        return "#%02x%02x%02x" % rgb